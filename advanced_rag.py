@@ -1,22 +1,129 @@
 # advanced_rag.py - Advanced RAG with Multi-Document Reasoning
 
-import requests
-from typing import List, Dict, Tuple
-from dataclasses import dataclass
+import atexit
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Union
+from dataclasses import dataclass, asdict
 from collections import defaultdict
 
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-    embeddings_class = HuggingFaceEmbeddings
-except ImportError:
-    from langchain_community.embeddings import SentenceTransformerEmbeddings
-    embeddings_class = SentenceTransformerEmbeddings
-
-from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
+from ann_index import AUTO_ANN_THRESHOLD, DEFAULT_EF_SEARCH, DEFAULT_NPROBE
+from bm25_index import reciprocal_rank_fusion
+from chunk_service import split_text, splitter_name
+from context_packer import DEFAULT_TOKEN_BUDGET, pack_context
+from embedding_cache import CachedEmbeddings, get_embedding_cache
+from hashing import content_hash
+from ollama_client import get_ollama_client
+from vector_index import VectorIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+STORE_FORMAT_VERSION = 1
+
+# Seconds without further changes before a save_later() is written
+SAVE_DELAY = float(os.getenv("RAG_SAVE_DELAY", "5"))
+
+
+def _split(content: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Split content with the same splitter for every index (memoized by the chunk service)"""
+    return split_text(content, chunk_size, chunk_overlap).texts()
+
+
+def _embed_batch(embedding_model: str, chunk_size: int, chunk_overlap: int,
+                 docs: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, List[str], np.ndarray]], int]:
+    """
+    Chunk and embed a batch of (doc_id, content) in one forward pass.
+    Runs in add_documents() worker processes, each with its own model
+    from the registry; the on-disk embedding cache is shared.
+    Returns ([(doc_id, chunks, vectors), ...], number of cache misses)
+    """
+    embeddings = CachedEmbeddings(embedding_model)
+    misses = get_embedding_cache().misses
+    
+    chunked = [(doc_id, _split(content, chunk_size, chunk_overlap)) for doc_id, content in docs]
+    all_chunks = [chunk for _, chunks in chunked for chunk in chunks]
+    vectors = np.asarray(embeddings.embed_documents(all_chunks), dtype=np.float32)
+    
+    results = []
+    offset = 0
+    for doc_id, chunks in chunked:
+        results.append((doc_id, chunks, vectors[offset:offset + len(chunks)]))
+        offset += len(chunks)
+    
+    return results, get_embedding_cache().misses - misses
+
+
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _store_lock(path: str):
+    """
+    Exclusive access to the store at path: a lock per path for threads of
+    this process, plus a lock on path.lock for other processes.
+    """
+    path = os.path.abspath(path)
+    with _path_locks_lock:
+        lock = _path_locks.setdefault(path, threading.Lock())
+    
+    with lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".lock", 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:  # LK_LOCK gives up after ~10s
+                        pass
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _recover_store(path: str):
+    """
+    Roll back a save() interrupted between its two renames (path missing,
+    the previous store left at path.old), or drop the .old copy a finished
+    save could not delete. Call with the store lock held.
+    """
+    old_path = path + ".old"
+    if not os.path.exists(os.path.join(old_path, "store.json")):
+        return
+    if os.path.exists(os.path.join(path, "store.json")):
+        shutil.rmtree(old_path, ignore_errors=True)
+        return
+    
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(old_path, path)
+    print(f" Recovered RAG store from {old_path}")
+
 
 @dataclass
 class Document:
@@ -39,30 +146,58 @@ class AdvancedRAG:
     - Cross-document comparison
     - Source attribution
     - Confidence scoring
+    
+    index_type is "auto" (exact search, HNSW above ann_threshold chunks),
+    "flat", "ivf_flat", "ivf_pq" or "hnsw"; nprobe / ef_search tune the
+    approximate backends. "sq8" / "pq" keep compressed vectors for the
+    scan and re-score the best candidates exactly. With hybrid=True, retrieval fuses the dense
+    ranking with a BM25 keyword ranking, so exact names (datasets, metric
+    acronyms, model names) are found even when the embedding misses them.
     """
     
-    def __init__(self, model="llama3", chunk_size=800, chunk_overlap=100):
+    # Candidates taken from each ranking before fusion, per requested result
+    FUSION_DEPTH = 4
+    
+    # Ollama options per task
+    ANSWER_OPTIONS = {"temperature": 0.3, "num_predict": 600}
+    ANALYSIS_OPTIONS = {"temperature": 0.4, "num_predict": 800}
+    CONNECTIONS_OPTIONS = {"temperature": 0.4, "num_predict": 700}
+    
+    def __init__(self, model="llama3", chunk_size=800, chunk_overlap=100,
+                 embedding_model="all-MiniLM-L6-v2", index_type="auto",
+                 ann_threshold=AUTO_ANN_THRESHOLD, nprobe=DEFAULT_NPROBE,
+                 ef_search=DEFAULT_EF_SEARCH, hybrid=True,
+                 context_token_budget=DEFAULT_TOKEN_BUDGET):
         self.model = model
-        self.ollama_url = "http://localhost:11434/api/generate"
+        self.ollama = get_ollama_client()
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.embedding_model = embedding_model
+        self.hybrid = hybrid
+        self.context_token_budget = context_token_budget
+        self.index_config = {
+            'index_type': index_type,
+            'ann_threshold': ann_threshold,
+            'nprobe': nprobe,
+            'ef_search': ef_search
+        }
         
-        # Initialize embeddings
-        try:
-            self.embeddings = embeddings_class(model_name="all-MiniLM-L6-v2")
-        except:
-            from langchain_community.embeddings import SentenceTransformerEmbeddings
-            self.embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+        # Initialize embeddings (through the shared on-disk cache)
+        self.embeddings = CachedEmbeddings(embedding_model)
         
         # Document store
         self.documents: Dict[str, Document] = {}
-        self.vectorstores: Dict[str, FAISS] = {}
-        self.global_vectorstore = None
+        self.index = VectorIndex(**self.index_config)
+        
+        # Serializes saves; holds the timer of a pending save_later()
+        self._save_lock = threading.RLock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._flush_at_exit = False
         
         print(" Advanced RAG initialized")
     
-    def add_document(self, doc_id: str, title: str, content: str, metadata: Dict = None):
-        """Add document to the RAG system"""
+    def add_document(self, doc_id: str, title: str, content: str, metadata: Dict = None) -> Dict:
+        """Add document to the RAG system (replaces an existing doc_id)"""
         doc = Document(
             id=doc_id,
             title=title,
@@ -70,136 +205,537 @@ class AdvancedRAG:
             metadata=metadata or {}
         )
         
-        self.documents[doc_id] = doc
+        stats = self._index_document(doc)
+        
+        print(f" Added document: {title} ({stats['chunks']} chunks, "
+              f"{stats['embedded']} embedded, {len(self.index)} total)")
+        return stats
+    
+    def add_documents(self, documents: Iterable[Union[Document, Dict, Tuple]],
+                      workers: int = None, batch_chunks: int = 512,
+                      progress=None) -> Dict:
+        """
+        Bulk-add documents, chunking and embedding them on a process pool.
+        
+        documents can be a generator of Document objects, dicts with
+        id / title / content / metadata keys, or (doc_id, title, content
+        [, metadata]) tuples. They are grouped into batches of about
+        batch_chunks chunks, one forward pass each. At most two batches
+        per worker are in flight, so large corpora are streamed rather
+        than held in memory at once. Results are committed to the index
+        in input order. workers=1 (or a corpus that fits in one batch)
+        embeds in this process.
+        progress(documents_done, chunks_done) is called after each batch.
+        
+        Returns: {'documents', 'chunks', 'embedded', 'seconds', 'chunks_per_second'}
+        """
+        if workers is None:
+            workers = min(4, max(1, (os.cpu_count() or 2) - 1))
+        
+        start = time.time()
+        stats = {'documents': 0, 'chunks': 0, 'embedded': 0}
+        config = (self.embedding_model, self.chunk_size, self.chunk_overlap)
+        
+        def commit(batch: List[Document], result):
+            results, misses = result
+            for doc, (doc_id, chunks, vectors) in zip(batch, results):
+                self.documents[doc.id] = doc
+                self.index.add(doc.id, chunks, vectors, self._chunk_metadatas(doc, len(chunks)))
+                stats['chunks'] += len(chunks)
+            stats['documents'] += len(batch)
+            stats['embedded'] += misses
+            if progress:
+                progress(stats['documents'], stats['chunks'])
+        
+        batches = self._document_batches(documents, batch_chunks)
+        
+        # A single batch isn't worth starting worker processes for
+        first = next(batches, None)
+        second = next(batches, None)
+        batches = itertools.chain([b for b in (first, second) if b is not None], batches)
+        
+        if workers <= 1 or second is None:
+            for batch in batches:
+                commit(batch, _embed_batch(*config, [(d.id, d.content) for d in batch]))
+        else:
+            # spawn: forking a process that already holds a torch model is unsafe
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                pending = deque()
+                for batch in batches:
+                    pending.append((batch, pool.submit(_embed_batch, *config,
+                                                       [(d.id, d.content) for d in batch])))
+                    if len(pending) >= 2 * workers:
+                        done_batch, future = pending.popleft()
+                        commit(done_batch, future.result())
+                while pending:
+                    done_batch, future = pending.popleft()
+                    commit(done_batch, future.result())
+        
+        self.index.maybe_compact()
+        
+        stats['seconds'] = time.time() - start
+        stats['chunks_per_second'] = stats['chunks'] / stats['seconds'] if stats['seconds'] else 0.0
+        print(f" Added {stats['documents']} documents ({stats['chunks']} chunks, "
+              f"{stats['embedded']} embedded) in {stats['seconds']:.1f}s "
+              f"- {stats['chunks_per_second']:.0f} chunks/s")
+        return stats
+    
+    def _document_batches(self, documents: Iterable, batch_chunks: int) -> Iterator[List[Document]]:
+        """Group documents into batches of roughly batch_chunks chunks"""
+        step = max(self.chunk_size - self.chunk_overlap, 1)
+        batch, estimated = [], 0
+        
+        for item in documents:
+            if isinstance(item, Document):
+                doc = item
+            elif isinstance(item, dict):
+                doc = Document(id=item['id'], title=item['title'], content=item['content'],
+                               metadata=item.get('metadata') or {})
+            else:
+                doc = Document(*item)
+            
+            batch.append(doc)
+            estimated += len(doc.content) // step + 1
+            if estimated >= batch_chunks:
+                yield batch
+                batch, estimated = [], 0
+        
+        if batch:
+            yield batch
+    
+    def update_document(self, doc_id: str, content: str, title: str = None,
+                        metadata: Dict = None) -> Dict:
+        """
+        Replace a document's content in place.
+        Only chunks whose text changed are re-embedded.
+        """
+        if doc_id not in self.documents:
+            raise KeyError(f"Unknown document: {doc_id}")
         
-        # Create document-specific vectorstore
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", ", ", " ", ""]
+        old = self.documents[doc_id]
+        doc = Document(
+            id=doc_id,
+            title=title or old.title,
+            content=content,
+            metadata=old.metadata if metadata is None else metadata
         )
         
-        chunks = splitter.split_text(content)
+        stats = self._index_document(doc)
+        
+        print(f" Updated document: {doc.title} ({stats['embedded']} of "
+              f"{stats['chunks']} chunks re-embedded)")
+        return stats
+    
+    def remove_document(self, doc_id: str) -> bool:
+        """Remove a document; its chunks are tombstoned and compacted later"""
+        if doc_id not in self.documents:
+            return False
+        
+        doc = self.documents.pop(doc_id)
+        self.index.remove(doc_id)
+        self.index.maybe_compact()
         
-        # Add metadata to each chunk
-        metadatas = [
+        print(f" Removed document: {doc.title} ({len(self.index)} chunks remain)")
+        return True
+    
+    def clear(self):
+        """Remove every document"""
+        self.documents = {}
+        self.index = VectorIndex(**self.index_config)
+        print(" RAG system cleared")
+    
+    def _index_document(self, doc: Document) -> Dict:
+        """Chunk and embed a document, reusing vectors of unchanged chunks"""
+        chunks = self._split_text(doc.content)
+        metadatas = self._chunk_metadatas(doc, len(chunks))
+        hashes = [content_hash(chunk) for chunk in chunks]
+        
+        # Vectors of the document's current chunks, keyed by content hash
+        previous = {}
+        with self.index.lock:
+            old_rows = self.index.doc_rows.get(doc.id)
+            if old_rows is not None and len(old_rows):
+                old_texts, old_vectors = self.index.get_rows(old_rows)
+                previous = {content_hash(t): v for t, v in zip(old_texts, old_vectors)}
+        
+        # One embedding per new chunk serves both global and per-document search
+        missing = [i for i, h in enumerate(hashes) if h not in previous]
+        embedded = self.embeddings.embed_documents([chunks[i] for i in missing]) if missing else []
+        
+        vectors = [previous.get(h) for h in hashes]
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+        
+        # Old rows of this doc_id are tombstoned by the index
+        self.documents[doc.id] = doc
+        self.index.add(doc.id, chunks, vectors, metadatas)
+        self.index.maybe_compact()
+        
+        return {
+            'chunks': len(chunks),
+            'embedded': len(missing),
+            'reused': len(chunks) - len(missing)
+        }
+    
+    def _split_text(self, content: str) -> List[str]:
+        """Split content with the same splitter for every index"""
+        return _split(content, self.chunk_size, self.chunk_overlap)
+    
+    def _chunk_metadatas(self, doc: Document, num_chunks: int) -> List[Dict]:
+        """Build per-chunk metadata for a document"""
+        return [
             {
-                'doc_id': doc_id,
-                'doc_title': title,
+                'doc_id': doc.id,
+                'doc_title': doc.title,
                 'chunk_index': i,
                 **doc.metadata
             }
-            for i in range(len(chunks))
+            for i in range(num_chunks)
         ]
-        
-        self.vectorstores[doc_id] = FAISS.from_texts(
-            chunks,
-            self.embeddings,
-            metadatas=metadatas
-        )
-        
-        print(f" Added document: {title} ({len(chunks)} chunks)")
-        
-        # Rebuild global index
-        self._rebuild_global_index()
     
     def _rebuild_global_index(self):
-        """Rebuild global index from all documents"""
-        all_texts = []
-        all_metadatas = []
+        """
+        Rebuild the index from all documents.
+        Re-embeds the whole corpus - only needed as a reference for the
+        incremental index (see benchmark_rag.py).
+        """
+        self.index = VectorIndex(**self.index_config)
         
         for doc_id, doc in self.documents.items():
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap
+            chunks = self._split_text(doc.content)
+            self.index.add(
+                doc_id,
+                chunks,
+                self.embeddings.embed_documents(chunks),
+                self._chunk_metadatas(doc, len(chunks))
             )
-            chunks = splitter.split_text(doc.content)
+        
+        print(f" Global index rebuilt: {len(self.index)} total chunks")
+    
+    def save(self, path: str, dtype: str = "float32"):
+        """
+        Persist documents, chunks, metadata and vectors to a directory.
+        Vectors can be stored as float16 to halve the file size. The index
+        is re-opened on the written files, so its vectors stay memory-mapped.
+        Replaces a pending save_later().
+        """
+        path = path.rstrip("/\\")
+        old_path = path + ".old"
+        
+        with self._save_lock, _store_lock(path):
+            self.cancel_save()
+            # Never delete .old while it is the only complete copy
+            _recover_store(path)
             
-            all_texts.extend(chunks)
-            all_metadatas.extend([
-                {
-                    'doc_id': doc_id,
-                    'doc_title': doc.title,
-                    'chunk_index': i,
-                    **doc.metadata
-                }
-                for i in range(len(chunks))
-            ])
-        
-        if all_texts:
-            self.global_vectorstore = FAISS.from_texts(
-                all_texts,
-                self.embeddings,
-                metadatas=all_metadatas
-            )
-            print(f" Global index rebuilt: {len(all_texts)} total chunks")
+            # A fresh directory per save, so no writer can reuse another's files
+            tmp_path = tempfile.mkdtemp(prefix=os.path.basename(path) + ".tmp-",
+                                        dir=os.path.dirname(os.path.abspath(path)))
+            try:
+                version = self.index.save(tmp_path, dtype=dtype)
+                
+                with open(os.path.join(tmp_path, "store.json"), 'w', encoding='utf-8') as f:
+                    json.dump({
+                        'format_version': STORE_FORMAT_VERSION,
+                        'embedding_model': self.embedding_model,
+                        'chunk_size': self.chunk_size,
+                        'chunk_overlap': self.chunk_overlap,
+                        'splitter': splitter_name(self.chunk_size),
+                        'documents': [asdict(doc) for doc in list(self.documents.values())]
+                    }, f)
+            except BaseException:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            
+            # Swap the finished store in so a crash never leaves a partial one
+            # (load() rolls back an interrupted swap). The index lets go of the
+            # files it maps from the old store while it is moved, then maps
+            # the new one.
+            with self.index.lock:
+                released = self.index.release_files(version)
+                swapped = False
+                try:
+                    if os.path.exists(path):
+                        os.replace(path, old_path)
+                    try:
+                        os.replace(tmp_path, path)
+                    except OSError:
+                        if os.path.exists(old_path):
+                            os.replace(old_path, path)
+                        raise
+                    swapped = True
+                finally:
+                    if released:
+                        self.index.reopen(path if swapped else tmp_path)
+                    elif not swapped:
+                        shutil.rmtree(tmp_path, ignore_errors=True)
+            shutil.rmtree(old_path, ignore_errors=True)
+        
+        print(f" Saved RAG store: {len(self.documents)} documents, {len(self.index)} chunks -> {path}")
+    
+    def save_later(self, path: str, delay: float = SAVE_DELAY):
+        """
+        Save to path once no further change has come in for delay seconds,
+        so a burst of adds and removes rewrites the store once. A pending
+        save is written at interpreter exit (or by flush_save()).
+        """
+        with self._save_lock:
+            self.cancel_save()
+            self._save_timer = threading.Timer(delay, self._save_due, args=(path,))
+            self._save_timer.daemon = True
+            self._save_timer.start()
+            
+            if not self._flush_at_exit:
+                atexit.register(self.flush_save)
+                self._flush_at_exit = True
+    
+    def flush_save(self):
+        """Write a pending save_later() now"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self.save(*self._save_timer.args)
+    
+    def cancel_save(self):
+        """Drop a pending save_later()"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+    
+    def _save_due(self, path: str):
+        with self._save_lock:
+            # Skip if a newer save_later() or an explicit save replaced this one
+            if self._save_timer is threading.current_thread():
+                self.save(path)
+    
+    @staticmethod
+    def store_exists(path: str) -> bool:
+        """Whether path holds a saved store (recovering one an interrupted save left at path.old)"""
+        path = path.rstrip("/\\")
+        with _store_lock(path):
+            _recover_store(path)
+            return os.path.exists(os.path.join(path, "store.json"))
+    
+    def load(self, path: str):
+        """
+        Load a store written by save(), replacing the current contents.
+        Vectors are memory-mapped, so opening is cheap even for large corpora.
+        Raises ValueError if the store was built with a different embedding
+        model, chunking parameters or splitter.
+        """
+        path = path.rstrip("/\\")
+        with _store_lock(path):
+            _recover_store(path)
+            return self._load(path)
+    
+    def _load(self, path: str):
+        with open(os.path.join(path, "store.json"), encoding='utf-8') as f:
+            info = json.load(f)
+        
+        if info.get('format_version') != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported RAG store format: {info.get('format_version')}")
+        
+        expected = {
+            'embedding_model': self.embedding_model,
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'splitter': splitter_name(self.chunk_size)
+        }
+        mismatched = [
+            f"{key}={info.get(key)!r} (expected {value!r})"
+            for key, value in expected.items()
+            if info.get(key) != value
+        ]
+        if mismatched:
+            raise ValueError(f"Incompatible RAG store at {path}: " + ", ".join(mismatched))
+        
+        self.index = VectorIndex.load(path, **self.index_config)
+        self.documents = {
+            doc['id']: Document(**doc) for doc in info['documents']
+        }
+        
+        print(f" Loaded RAG store: {len(self.documents)} documents, {len(self.index)} chunks")
+        return self
     
     def retrieve_context(self, query: str, k: int = 5, doc_ids: List[str] = None) -> List[Tuple]:
         """
         Retrieve relevant context with metadata
         Returns: [(text, metadata, similarity_score), ...]
         """
-        if doc_ids:
-            # Search specific documents
-            all_results = []
-            for doc_id in doc_ids:
-                if doc_id in self.vectorstores:
-                    results = self.vectorstores[doc_id].similarity_search_with_score(query, k=k)
-                    all_results.extend(results)
+        return self.retrieve_context_batch([query], k=k, doc_ids=doc_ids)[0]
+    
+    def retrieve_context_batch(self, queries: List[str], k: int = 5,
+                               doc_ids: List[str] = None) -> List[List[Tuple]]:
+        """
+        Retrieve context for many queries with one embedding pass and one
+        matrix search.
+        Returns one [(text, metadata, similarity_score), ...] list per query
+        """
+        return self._retrieve_batch(queries, k, [doc_ids] * len(queries))
+    
+    def _retrieve_batch(self, queries: List[str], k: int,
+                        filters: List[List[str]]) -> List[List[Tuple]]:
+        """
+        Batched retrieval where each query has its own doc_ids filter.
+        Queries sharing a filter are searched together.
+        """
+        if not queries:
+            return []
+        if len(self.index) == 0:
+            return [[] for _ in queries]
+        
+        # Embed each distinct query once, in a single forward pass
+        unique_queries = list(dict.fromkeys(queries))
+        vectors = np.asarray(self.embeddings.embed_documents(unique_queries), dtype=np.float32)
+        query_rows = {q: i for i, q in enumerate(unique_queries)}
+        
+        # Group queries by filter so each group is one matrix search
+        groups = defaultdict(list)
+        for i, doc_ids in enumerate(filters):
+            groups[tuple(doc_ids) if doc_ids else None].append(i)
+        
+        results = [None] * len(queries)
+        for doc_ids, positions in groups.items():
+            group_vectors = vectors[[query_rows[queries[i]] for i in positions]]
             
-            # Sort by score and take top k
-            all_results.sort(key=lambda x: x[1])
-            results = all_results[:k]
-        else:
-            # Search all documents
-            if not self.global_vectorstore:
-                return []
-            results = self.global_vectorstore.similarity_search_with_score(query, k=k)
+            # Hold the lock so compaction can't renumber rows before formatting
+            with self.index.lock:
+                # One filtered search over the shared index for the selected documents
+                doc_filter = list(doc_ids) if doc_ids else None
+                if not self.hybrid:
+                    group_results = self.index.search_batch(group_vectors, k=k, doc_ids=doc_filter)
+                else:
+                    depth = k * self.FUSION_DEPTH
+                    dense = self.index.search_batch(group_vectors, k=depth, doc_ids=doc_filter)
+                    lexical = self.index.lexical_search_batch(
+                        [queries[i] for i in positions], k=depth, doc_ids=doc_filter
+                    )
+                    group_results = [
+                        self._fuse(vector, dense_hits, lexical_hits, k)
+                        for vector, dense_hits, lexical_hits in zip(group_vectors, dense, lexical)
+                    ]
+                
+                for i, hits in zip(positions, group_results):
+                    results[i] = self._format_hits(hits)
         
-        # Format results with similarity scores
+        return results
+    
+    def _fuse(self, query_vector, dense_hits: List[Tuple[int, float]],
+              lexical_hits: List[Tuple[int, float]], k: int) -> List[Tuple[int, float]]:
+        """
+        Reciprocal rank fusion of dense and BM25 hits.
+        Returns the top k as (row, distance) so similarity scores keep their
+        dense meaning; keyword-only hits get their distance computed exactly.
+        """
+        fused = reciprocal_rank_fusion([
+            [row for row, _ in dense_hits],
+            [row for row, _ in lexical_hits]
+        ])[:k]
+        
+        distances = dict(dense_hits)
+        missing = [row for row, _ in fused if row not in distances]
+        if missing:
+            distances.update(zip(missing, self.index.distances(query_vector, missing).tolist()))
+        
+        return [(row, distances[row]) for row, _ in fused]
+    
+    def _format_hits(self, hits: List[Tuple[int, float]]) -> List[Tuple]:
+        """Format (row, distance) hits with similarity scores"""
         formatted = []
-        for doc, distance in results:
+        for row, distance in hits:
             similarity = 1 / (1 + distance)  # Convert distance to similarity
             formatted.append((
-                doc.page_content,
-                doc.metadata,
+                self.index.texts[row],
+                self.index.metadatas[row],
                 similarity
             ))
         
         return formatted
     
-    def answer_with_context(self, query: str, k: int = 5, doc_ids: List[str] = None) -> Dict:
+    def answer_with_context(self, query: str, k: int = 5, doc_ids: List[str] = None,
+                            token_budget: int = None) -> Dict:
         """
-        Answer query with retrieved context and source attribution
+        Answer query with retrieved context and source attribution.
+        Overlapping neighbour chunks are merged and the context is packed
+        into token_budget (default: context_token_budget) tokens.
         """
-        # Retrieve context
-        contexts = self.retrieve_context(query, k=k, doc_ids=doc_ids)
-        
-        if not contexts:
+        prepared = self._prepare_answer(query, k, doc_ids, token_budget)
+        if prepared is None:
             return {
                 'answer': "I couldn't find relevant information to answer this question.",
                 'sources': [],
                 'confidence': 0.0
             }
         
-        # Build context string with sources
-        context_parts = []
-        sources_info = []
+        prompt = prepared.pop('prompt')
         
-        for i, (text, metadata, similarity) in enumerate(contexts, 1):
-            doc_title = metadata.get('doc_title', 'Unknown')
-            context_parts.append(f"[Source {i} - {doc_title}]:\n{text}")
+        try:
+            response = self.ollama.generate(self.model, prompt, self.ANSWER_OPTIONS,
+                                            timeout=120, source="rag_answer")
             
-            sources_info.append({
-                'source_id': i,
-                'doc_id': metadata.get('doc_id'),
-                'doc_title': doc_title,
-                'similarity': similarity,
-                'chunk_index': metadata.get('chunk_index', 0)
-            })
+            if response.status_code == 200:
+                data = response.json()
+                answer = data.get("response", "").strip()
+                
+                return {'answer': answer, **prepared}
+            else:
+                return {
+                    'answer': f"Error: LLM returned status {response.status_code}",
+                    'sources': prepared['sources'],
+                    'confidence': 0.0
+                }
+                
+        except Exception as e:
+            return {
+                'answer': f"Error generating answer: {str(e)}",
+                'sources': prepared['sources'],
+                'confidence': 0.0
+            }
+    
+    def answer_with_context_stream(self, query: str, k: int = 5, doc_ids: List[str] = None,
+                                   token_budget: int = None) -> Dict:
+        """
+        Streaming answer_with_context(): sources, confidence and token
+        counts are filled in before generation starts, 'answer_stream'
+        yields the answer text as the model produces it.
+        """
+        prepared = self._prepare_answer(query, k, doc_ids, token_budget)
+        if prepared is None:
+            return {
+                'answer_stream': iter(["I couldn't find relevant information to answer this question."]),
+                'sources': [],
+                'confidence': 0.0
+            }
+        
+        prompt = prepared.pop('prompt')
+        prepared['answer_stream'] = self._stream(prompt, self.ANSWER_OPTIONS, "rag_answer")
+        return prepared
+    
+    def _prepare_answer(self, query: str, k: int, doc_ids: List[str],
+                        token_budget: int = None) -> Dict:
+        """Retrieve and pack context, returns the prompt and source info (None if nothing found)"""
+        # Retrieve context
+        contexts = self.retrieve_context(query, k=k, doc_ids=doc_ids)
         
-        context_str = "\n\n".join(context_parts)
+        if not contexts:
+            return None
+        
+        # Build context string with sources (one per merged span)
+        packed = pack_context(contexts, token_budget or self.context_token_budget)
+        context_str = packed.text
+        sources_info = [
+            {
+                'source_id': i,
+                'doc_id': span.doc_id,
+                'doc_title': span.doc_title,
+                'similarity': span.similarity,
+                'chunk_index': span.chunk_indices[0],
+                'chunk_indices': span.chunk_indices
+            }
+            for i, span in enumerate(packed.spans, 1)
+        ]
+        print(f" Context packed: {len(contexts)} chunks -> {len(packed.spans)} sources, "
+              f"{packed.tokens} tokens ({packed.tokens_saved} saved)")
         
         # Generate answer with LLM
         prompt = f"""You are Athena, an AI research assistant. Answer the question based ONLY on the provided context.
@@ -217,59 +753,70 @@ QUESTION: {query}
 
 ANSWER (with source citations):"""
         
+        # Calculate confidence based on context relevance
+        avg_similarity = np.mean([s[2] for s in contexts])
+        confidence = min(avg_similarity * 1.2, 1.0)  # Boosted slightly
+        
+        return {
+            'prompt': prompt,
+            'sources': sources_info,
+            'confidence': confidence,
+            'num_sources_used': len(contexts),
+            'context_tokens': packed.tokens,
+            'tokens_saved': packed.tokens_saved
+        }
+    
+    def _stream(self, prompt: str, options: Dict, source: str) -> Iterator[str]:
+        """Stream generated text; errors are yielded as text like the blocking calls return them"""
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "num_predict": 600
-                }
-            }
-            
-            response = requests.post(self.ollama_url, json=payload, timeout=120)
+            yield from self.ollama.stream(self.model, prompt, options, source=source)
+        except Exception as e:
+            yield f"\n\nError generating answer: {str(e)}"
+    
+    def compare_documents(self, query: str, doc_ids: List[str], k: int = 3) -> Dict:
+        """
+        Compare multiple documents on a specific topic
+        """
+        if len(doc_ids) < 2:
+            return {'error': 'Need at least 2 documents to compare'}
+        
+        prompt = self._comparison_prompt(query, doc_ids, k)
+        
+        try:
+            response = self.ollama.generate(self.model, prompt, self.ANALYSIS_OPTIONS,
+                                            timeout=120, source="rag_compare")
             
             if response.status_code == 200:
                 data = response.json()
-                answer = data.get("response", "").strip()
-                
-                # Calculate confidence based on context relevance
-                avg_similarity = np.mean([s[2] for s in contexts])
-                confidence = min(avg_similarity * 1.2, 1.0)  # Boosted slightly
+                comparison = data.get("response", "").strip()
                 
                 return {
-                    'answer': answer,
-                    'sources': sources_info,
-                    'confidence': confidence,
-                    'num_sources_used': len(contexts)
+                    'comparison': comparison,
+                    'documents_compared': [self.documents[d].title for d in doc_ids],
+                    'query': query
                 }
             else:
-                return {
-                    'answer': f"Error: LLM returned status {response.status_code}",
-                    'sources': sources_info,
-                    'confidence': 0.0
-                }
+                return {'error': f'LLM error: {response.status_code}'}
                 
         except Exception as e:
-            return {
-                'answer': f"Error generating answer: {str(e)}",
-                'sources': sources_info,
-                'confidence': 0.0
-            }
+            return {'error': str(e)}
     
-    def compare_documents(self, query: str, doc_ids: List[str], k: int = 3) -> Dict:
-        """
-        Compare multiple documents on a specific topic
-        """
+    def compare_documents_stream(self, query: str, doc_ids: List[str], k: int = 3) -> Dict:
+        """Streaming compare_documents(): 'comparison_stream' yields the comparison text"""
         if len(doc_ids) < 2:
             return {'error': 'Need at least 2 documents to compare'}
         
-        # Retrieve context from each document
-        doc_contexts = {}
-        for doc_id in doc_ids:
-            contexts = self.retrieve_context(query, k=k, doc_ids=[doc_id])
-            doc_contexts[doc_id] = contexts
+        prompt = self._comparison_prompt(query, doc_ids, k)
+        return {
+            'comparison_stream': self._stream(prompt, self.ANALYSIS_OPTIONS, "rag_compare"),
+            'documents_compared': [self.documents[d].title for d in doc_ids],
+            'query': query
+        }
+    
+    def _comparison_prompt(self, query: str, doc_ids: List[str], k: int) -> str:
+        # Retrieve context from each document in one batched call
+        per_doc = self._retrieve_batch([query] * len(doc_ids), k, [[d] for d in doc_ids])
+        doc_contexts = dict(zip(doc_ids, per_doc))
         
         # Build comparison prompt
         comparison_parts = []
@@ -280,7 +827,7 @@ ANSWER (with source citations):"""
         
         comparison_str = "\n\n---\n\n".join(comparison_parts)
         
-        prompt = f"""Compare how these research papers address the following topic: {query}
+        return f"""Compare how these research papers address the following topic: {query}
 
 PAPERS:
 {comparison_str}
@@ -293,28 +840,26 @@ Provide a structured comparison:
 4. **Synthesis**: What can we learn by combining their insights?
 
 Be specific and reference each paper by name."""
+    
+    def find_connections(self, concept: str, doc_ids: List[str] = None) -> Dict:
+        """
+        Find how a concept connects across documents
+        """
+        prompt, doc_mentions = self._connections_prompt(concept, doc_ids)
         
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.4,
-                    "num_predict": 800
-                }
-            }
-            
-            response = requests.post(self.ollama_url, json=payload, timeout=120)
+            response = self.ollama.generate(self.model, prompt, self.CONNECTIONS_OPTIONS,
+                                            timeout=120, source="rag_connections")
             
             if response.status_code == 200:
                 data = response.json()
-                comparison = data.get("response", "").strip()
+                analysis = data.get("response", "").strip()
                 
                 return {
-                    'comparison': comparison,
-                    'documents_compared': [self.documents[d].title for d in doc_ids],
-                    'query': query
+                    'concept': concept,
+                    'analysis': analysis,
+                    'documents': list(doc_mentions.keys()),
+                    'total_mentions': sum(len(m) for m in doc_mentions.values())
                 }
             else:
                 return {'error': f'LLM error: {response.status_code}'}
@@ -322,17 +867,23 @@ Be specific and reference each paper by name."""
         except Exception as e:
             return {'error': str(e)}
     
-    def find_connections(self, concept: str, doc_ids: List[str] = None) -> Dict:
-        """
-        Find how a concept connects across documents
-        """
+    def find_connections_stream(self, concept: str, doc_ids: List[str] = None) -> Dict:
+        """Streaming find_connections(): 'analysis_stream' yields the analysis text"""
+        prompt, doc_mentions = self._connections_prompt(concept, doc_ids)
+        return {
+            'concept': concept,
+            'analysis_stream': self._stream(prompt, self.CONNECTIONS_OPTIONS, "rag_connections"),
+            'documents': list(doc_mentions.keys()),
+            'total_mentions': sum(len(m) for m in doc_mentions.values())
+        }
+    
+    def _connections_prompt(self, concept: str, doc_ids: List[str]) -> Tuple[str, Dict]:
         # Get relevant chunks from all documents
         contexts = self.retrieve_context(concept, k=10, doc_ids=doc_ids)
         
         # Group by document
         doc_mentions = defaultdict(list)
         for text, metadata, similarity in contexts:
-            doc_id = metadata.get('doc_id')
             doc_title = metadata.get('doc_title', 'Unknown')
             doc_mentions[doc_title].append({
                 'text': text[:200] + '...' if len(text) > 200 else text,
@@ -357,34 +908,7 @@ Provide:
 3. **Evolution/Trends**: Are there emerging patterns or shifts in understanding?
 4. **Research Gaps**: What aspects need more investigation?"""
         
-        try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.4,
-                    "num_predict": 700
-                }
-            }
-            
-            response = requests.post(self.ollama_url, json=payload, timeout=120)
-            
-            if response.status_code == 200:
-                data = response.json()
-                analysis = data.get("response", "").strip()
-                
-                return {
-                    'concept': concept,
-                    'analysis': analysis,
-                    'documents': list(doc_mentions.keys()),
-                    'total_mentions': sum(len(m) for m in doc_mentions.values())
-                }
-            else:
-                return {'error': f'LLM error: {response.status_code}'}
-                
-        except Exception as e:
-            return {'error': str(e)}
+        return prompt, doc_mentions
     
     def get_document_summary(self) -> Dict:
         """Get summary of loaded documents"""
@@ -406,6 +930,28 @@ Provide:
 #TEST SUITE
 
 
+_shared: Dict[str, AdvancedRAG] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_rag(path: str, **config) -> AdvancedRAG:
+    """
+    The AdvancedRAG persisted at path, one per process, so every Streamlit
+    session reads and saves the same corpus instead of overwriting each
+    other's copies. Loaded from path on first use; if the saved store does
+    not match config, that first call raises ValueError and the store
+    starts empty.
+    """
+    key = os.path.abspath(path)
+    with _shared_lock:
+        rag = _shared.get(key)
+        if rag is None:
+            rag = _shared[key] = AdvancedRAG(**config)
+            if AdvancedRAG.store_exists(path):
+                rag.load(path)
+        return rag
+
+
 if __name__ == "__main__":
     print("=" * 70)
     print(" ADVANCED RAG SYSTEM TEST")
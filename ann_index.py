@@ -0,0 +1,178 @@
+# ann_index.py - FAISS index backends (flat / IVF / HNSW) shared by the vector indexes
+
+from typing import Optional
+
+import faiss
+import numpy as np
+
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "pq")
+
+# Backends that store compressed codes; their hits should be re-scored
+# against the full-precision vectors
+QUANTIZED_TYPES = ("ivf_pq", "sq8", "pq")
+
+# Above this many chunks "auto" switches from exact search to HNSW
+AUTO_ANN_THRESHOLD = 50_000
+
+# Default search-time knobs
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32
+
+
+def choose_index_type(num_vectors: int, index_type: str = "auto",
+                      threshold: int = AUTO_ANN_THRESHOLD) -> str:
+    """Resolve "auto" to a concrete backend for the given corpus size"""
+    if index_type == "auto":
+        return "hnsw" if num_vectors >= threshold else "flat"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected auto or one of {INDEX_TYPES})")
+    return index_type
+
+
+def default_nlist(num_vectors: int) -> int:
+    """IVF list count: ~4*sqrt(n), with enough points per centroid to train"""
+    nlist = int(4 * np.sqrt(max(num_vectors, 1)))
+    return max(1, min(nlist, num_vectors // 39 or 1))
+
+
+def pq_nbits(num_vectors: int) -> int:
+    """Bits per PQ code: k-means wants ~39 training points per centroid"""
+    return int(min(8, max(1, np.log2(max(num_vectors // 39, 2)))))
+
+
+def pq_subquantizers(dim: int) -> int:
+    """Number of PQ sub-vectors: largest divisor of dim up to dim / 8"""
+    for m in range(max(dim // 8, 1), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str,
+                      nlist: Optional[int] = None,
+                      nprobe: int = DEFAULT_NPROBE,
+                      ef_search: int = DEFAULT_EF_SEARCH) -> faiss.Index:
+    """
+    Build, train and fill a FAISS index over vectors (squared L2 metric).
+    Row i of vectors gets FAISS id i.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = min(nlist or default_nlist(n), max(n, 1))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_subquantizers(dim), pq_nbits(n))
+        index.train(vectors)
+
+    elif index_type == "sq8":
+        # One byte per dimension, per-dimension range learned from the data
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+        index.train(vectors)
+
+    elif index_type == "pq":
+        # Plain PQ as a single-list IVF: IndexPQ can't take an ID selector
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, 1, pq_subquantizers(dim), pq_nbits(n))
+        index.train(vectors)
+
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    if n:
+        index.add(vectors)
+
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+
+class RescoredIndex:
+    """
+    A filled quantized index whose searches take k_factor * k candidates
+    from the codes and re-score them exactly against vectors. vectors is
+    referenced, not copied, so callers that already hold the float
+    matrix (or a memmap of it) pay only for the codes. Other attributes
+    (ntotal, d, ...) come from the wrapped index; vectors cannot be added.
+    """
+
+    def __init__(self, index: faiss.Index, vectors: np.ndarray, k_factor: int = 4):
+        self.index = index
+        self.vectors = vectors
+        self.k_factor = k_factor
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def add(self, vectors: np.ndarray):
+        raise NotImplementedError("RescoredIndex is read-only; rebuild it to add vectors")
+
+    def reconstruct(self, i: int) -> np.ndarray:
+        return np.array(self.vectors[i], dtype=np.float32)
+
+    def search(self, queries: np.ndarray, k: int, params=None):
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        fetch = min(self.index.ntotal, max(k, k * self.k_factor))
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if fetch == 0:
+            return distances, ids
+        _, candidates = self.index.search(queries, fetch, params=params)
+        for q, row in enumerate(candidates):
+            row = row[row >= 0]
+            exact = ((np.asarray(self.vectors[row], dtype=np.float32) - queries[q]) ** 2).sum(axis=1)
+            order = np.argsort(exact, kind="stable")[:k]
+            distances[q, :len(order)] = exact[order]
+            ids[q, :len(order)] = row[order]
+        return distances, ids
+
+
+def set_search_params(index: faiss.Index, nprobe: int = DEFAULT_NPROBE,
+                      ef_search: int = DEFAULT_EF_SEARCH):
+    """Set default nprobe / efSearch on the index (used by plain index.search calls)"""
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = nprobe
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def search_parameters(index: faiss.Index, nprobe: int = DEFAULT_NPROBE,
+                      ef_search: int = DEFAULT_EF_SEARCH,
+                      selector: Optional[faiss.IDSelector] = None):
+    """Per-call search parameters with an optional ID selector"""
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Backend name of a FAISS index built by build_faiss_index()"""
+    if isinstance(index, RescoredIndex):
+        index = index.index
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq" if index.nlist == 1 else "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def index_bytes_per_vector(index: faiss.Index) -> float:
+    """Serialized (~ resident) size of a FAISS index per stored vector"""
+    if index.ntotal == 0:
+        return 0.0
+    return faiss.serialize_index(index).nbytes / index.ntotal
@@ -1,9 +1,11 @@
 #Main Athena Application
 
+import os
 import streamlit as st
 import PyPDF2
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from main import research_topic
+from pdf_summarizer import summarize_document
+from hashing import content_hash
 from qa_engine import make_qa_chain
 from semantic_search import build_semantic_index, search_semantic
 from pdf_utils import extract_text_from_pdf
@@ -22,6 +24,22 @@ def get_tracker():
         st.session_state.agent_tracker = AgentTracker()
     return st.session_state.agent_tracker
 
+def render_stream(stream, css_class=None):
+    """Render generated text as it arrives, returns the full text"""
+    def show(text):
+        if css_class:
+            placeholder.markdown(f"<div class='{css_class}'>{text}</div>", unsafe_allow_html=True)
+        else:
+            placeholder.markdown(text)
+    
+    placeholder = st.empty()
+    text = ""
+    for token in stream:
+        text += token
+        show(text + "▌")
+    show(text)
+    return text
+
 # Optional features
 try:
     from document_comparison import DocumentComparison
@@ -37,7 +55,7 @@ except ImportError:
 
 try:
     from kg_visualizer import render_knowledge_graph_tab
-    from advanced_rag import AdvancedRAG
+    from advanced_rag import get_shared_rag
     KG_RAG_AVAILABLE = True
 except ImportError:
     KG_RAG_AVAILABLE = False
@@ -123,8 +141,16 @@ if "agent_tracker" not in st.session_state:
 if COMPARISON_AVAILABLE and "doc_comparison" not in st.session_state:
     st.session_state.doc_comparison = DocumentComparison(model="llama3")
 
+# Persisted Advanced RAG corpus (reloaded on restart instead of re-embedding)
+RAG_STORE_PATH = os.path.join(os.getenv("CACHE_DIR", ".cache"), "rag_store")
+
+# One corpus shared by every session, so sessions never save over each other
 if KG_RAG_AVAILABLE and "advanced_rag" not in st.session_state:
-    st.session_state.advanced_rag = AdvancedRAG(chunk_size=800, chunk_overlap=100)
+    try:
+        st.session_state.advanced_rag = get_shared_rag(RAG_STORE_PATH, chunk_size=800, chunk_overlap=100)
+    except ValueError as e:
+        st.warning(f"Saved RAG store not loaded: {e}")
+        st.session_state.advanced_rag = get_shared_rag(RAG_STORE_PATH, chunk_size=800, chunk_overlap=100)
 
 # Input section - Research Topic and Upload side by side
 st.markdown(f"<h3 style='color: {theme['accent']}; margin-bottom: 0.5rem;'>Start Your Research</h3>", unsafe_allow_html=True)
@@ -139,6 +165,13 @@ with col1:
 
 with col2:
     uploaded_file = st.file_uploader("Upload a research paper", type="pdf")
+    summary_coverage = st.select_slider(
+        "Text sent to the LLM",
+        options=[25, 40, 60, 100],
+        value=100,
+        format_func=lambda v: f"{v}%",
+        help="Below 100%, only the most representative sentences are summarized (faster, less coverage)"
+    )
 
 # Summarization
 if st.button("Research", key="research_button", type="primary"):
@@ -159,23 +192,38 @@ if st.button("Research", key="research_button", type="primary"):
                     st.session_state.pdf_uploaded = True
                     st.session_state.pdf_filename = uploaded_file.name
 
-                    # Reduce chunk size to prevent timeouts
-                    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=100)
-                    chunks = splitter.split_text(text)
-
-                    summaries = []
-                    st.info(f"Processing {len(chunks)} sections...")
+                    # Sections are summarized concurrently, then combined
+                    status = st.empty()
                     progress_bar = st.progress(0)
 
-                    for i, chunk in enumerate(chunks):
-                        partial_query = f"Summarize this section of a research paper:\n\n{chunk}"
-                        chunk_summary = research_topic(partial_query, skip_tools=True)
-                        summaries.append(chunk_summary)
-                        progress_bar.progress((i + 1) / len(chunks))
-
-                    combined_text = "\n\n".join(summaries)
-                    final_query = f"Combine the following section summaries into one cohesive academic summary:\n\n{combined_text}"
-                    result = research_topic(final_query, skip_tools=True)
+                    def report(done, total):
+                        status.info(f"Processing {total} sections... ({done}/{total})")
+                        progress_bar.progress(done / total)
+
+                    # Finished sections are checkpointed under the PDF's hash, so a
+                    # rerun or re-upload continues where the last run stopped
+                    summary_result = summarize_document(text, chunk_size=1500, chunk_overlap=100,
+                                                        progress=report,
+                                                        doc_hash=content_hash(uploaded_file.getvalue()),
+                                                        extract_fraction=summary_coverage / 100)
+                    result = summary_result.summary
+
+                    if summary_result.from_store:
+                        st.info("This PDF was summarized before, loaded the saved summary.")
+                    elif summary_result.resumed_sections:
+                        st.info(f"Resumed: {summary_result.resumed_sections} sections were already "
+                                f"summarized in a previous run.")
+
+                    if summary_result.failed:
+                        st.warning(f"{len(summary_result.failed)} of {len(summary_result.section_summaries)} "
+                                   f"sections could not be summarized and were skipped.")
+                    st.caption(f"Summarized {len(summary_result.section_summaries)} sections in "
+                               f"{summary_result.seconds:.1f}s ({summary_result.workers} in parallel, "
+                               f"{summary_result.reduce_levels} combine levels)")
+                    if summary_result.token_reduction > 0 and not summary_result.from_store:
+                        st.caption(f"Pre-selection: {summary_result.tokens_before} -> "
+                                   f"{summary_result.tokens_to_llm} tokens "
+                                   f"({summary_result.token_reduction:.0%} fewer)")
 
                 except Exception as e:
                     st.error(f"Error processing PDF: {e}")
@@ -268,13 +316,11 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
             if query.strip() == "":
                 st.warning("Please enter a question.")
             else:
-                with st.spinner("Thinking..."):
-                    try:
-                        answer = st.session_state.qa_chain(query)
-                        st.markdown("**Answer:**")
-                        st.markdown(f"<div class='answer-box'>{answer}</div>", unsafe_allow_html=True)
-                    except Exception as e:
-                        st.error(f"Error getting answer: {e}")
+                try:
+                    st.markdown("**Answer:**")
+                    render_stream(st.session_state.qa_chain(query, stream=True), "answer-box")
+                except Exception as e:
+                    st.error(f"Error getting answer: {e}")
 
     # SEMANTIC SEARCH TAB
     with tabs[tab_idx]:
@@ -409,15 +455,18 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
             send_button = st.button("Send", key="send_chat")
         
         if send_button and user_input.strip():
-            with st.spinner("Athena is thinking..."):
-                response = st.session_state.athena_chat.chat(user_input)
-                
-                st.session_state.chat_messages.append({
-                    "user": user_input,
-                    "assistant": response
-                })
-                
-                st.rerun()
+            with st.chat_message("user"):
+                st.markdown(user_input)
+            
+            with st.chat_message("assistant"):
+                response = render_stream(st.session_state.athena_chat.chat_stream(user_input))
+            
+            st.session_state.chat_messages.append({
+                "user": user_input,
+                "assistant": response
+            })
+            
+            st.rerun()
         elif send_button:
             st.warning("Please enter a message")
         
@@ -456,7 +505,8 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
             
             with col2:
                 if st.button("Clear All", key="clear_rag"):
-                    st.session_state.advanced_rag = AdvancedRAG(chunk_size=800)
+                    rag.clear()
+                    rag.save(RAG_STORE_PATH)
                     st.success("RAG system cleared!")
                     st.rerun()
             
@@ -470,6 +520,8 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
                         content=st.session_state.pdf_text,
                         metadata={'type': 'research_paper'}
                     )
+                    # Written once the user stops adding / removing documents
+                    rag.save_later(RAG_STORE_PATH)
                 st.success(f"Added: {doc_id}")
                 st.rerun()
             
@@ -485,6 +537,10 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
                         st.write(f"**ID:** {doc['id']}")
                         if doc.get('metadata'):
                             st.write(f"**Metadata:** {doc['metadata']}")
+                        if st.button("Remove", key=f"remove_rag_{doc['id']}"):
+                            rag.remove_document(doc['id'])
+                            rag.save_later(RAG_STORE_PATH)
+                            st.rerun()
                 
                 st.markdown("---")
                 
@@ -515,8 +571,8 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
                 
                 if st.button("Answer with RAG", type="primary", key="rag_answer"):
                     if rag_query:
-                        with st.spinner("Retrieving context and generating answer..."):
-                            result = rag.answer_with_context(
+                        with st.spinner("Retrieving context..."):
+                            result = rag.answer_with_context_stream(
                                 rag_query,
                                 k=k_contexts,
                                 doc_ids=doc_filter if doc_filter else None
@@ -529,9 +585,12 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
                         with col1:
                             st.markdown(f"**Confidence:** {result['confidence']:.0%}")
                         with col2:
-                            st.markdown(f"**Sources Used:** {result['num_sources_used']}")
+                            st.markdown(f"**Sources Used:** {result.get('num_sources_used', 0)}")
+                        if 'context_tokens' in result:
+                            st.caption(f"Context: ~{result['context_tokens']} tokens "
+                                       f"({result['tokens_saved']} saved by merging overlapping chunks)")
                         
-                        st.markdown(f"<div class='rag-box'>{result['answer']}</div>", unsafe_allow_html=True)
+                        result['answer'] = render_stream(result['answer_stream'], "rag-box")
                         
                         # Display sources
                         st.markdown(f"<h4 style='color: {theme['accent']};'>Sources</h4>", unsafe_allow_html=True)
@@ -542,7 +601,8 @@ if st.session_state.pdf_uploaded and st.session_state.last_result:
                                 expanded=(source['source_id'] <= 2)
                             ):
                                 st.write(f"**Document ID:** {source['doc_id']}")
-                                st.write(f"**Chunk:** {source['chunk_index']}")
+                                chunks = source.get('chunk_indices', [source['chunk_index']])
+                                st.write(f"**Chunk{'s' if len(chunks) > 1 else ''}:** {', '.join(map(str, chunks))}")
                                 st.write(f"**Relevance:** {source['similarity']:.1%}")
                     else:
                         st.warning("Please enter a question")
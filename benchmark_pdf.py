@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for PDF text extraction and cleaning.
+Run: python benchmark_pdf.py [file.pdf ...]
+
+Without arguments the cleaner runs on synthetic extracted text (hard-wrapped
+lines with some letter-spaced ones, as PyPDF2 returns them for resumes and
+posters) and extraction on generated PDFs. PDF paths are used for both.
+"""
+
+import io
+import os
+import random
+import re
+import sys
+import textwrap
+import time
+
+import PyPDF2
+
+from benchmark_rag import make_document
+import pdf_utils
+from pdf_utils import clean_extracted_text, extract_text_from_pdf
+
+
+def legacy_clean(text: str) -> str:
+    """The previous clean_extracted_text: 15 joining passes and 7 more full-text regex passes"""
+    for _ in range(15):
+        text = re.sub(r'([A-Za-z0-9]) ([A-Za-z0-9])', r'\1\2', text)
+    text = re.sub(r'\.([A-Z])', r'. \1', text)
+    text = re.sub(r',([A-Za-z])', r', \1', text)
+    text = re.sub(r'([A-Za-z])\(', r'\1 (', text)
+    text = re.sub(r'\)([A-Za-z])', r') \1', text)
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+    text = re.sub(r' {2,}', ' ', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def make_extracted_text(megabytes: float, spaced_share: float = 0.1, seed: int = 0) -> str:
+    """Raw PDF text of about `megabytes`: wrapped lines, spaced_share of them letter-spaced"""
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    page = 0
+    while size < megabytes * 1024 * 1024:
+        for line in textwrap.wrap(make_document(page, paragraphs=7), 90):
+            if rng.random() < spaced_share:
+                line = "  ".join(" ".join(word) for word in line.split())
+            lines.append(line)
+            size += len(line) + 1
+        lines.append("")
+        page += 1
+    return "\n".join(lines)
+
+
+def benchmark_cleaning(texts, legacy_limit_mb: float = 5):
+    """Throughput of clean_extracted_text (and the previous version on the smaller inputs)"""
+    print("=" * 70)
+    print(" BENCHMARK: clean_extracted_text throughput")
+    print("=" * 70)
+    print(f"\n{'input':<24} {'MB':>6} {'cleaned (MB/s)':>15} {'previous (MB/s)':>16}")
+
+    for label, text in texts:
+        mb = len(text.encode('utf-8')) / (1024 * 1024)
+
+        start = time.time()
+        clean_extracted_text(text)
+        new_rate = mb / max(time.time() - start, 1e-9)
+
+        previous = "skipped"
+        if mb <= legacy_limit_mb:
+            start = time.time()
+            legacy_clean(text)
+            previous = f"{mb / max(time.time() - start, 1e-9):.1f}"
+
+        print(f"{label:<24} {mb:>6.1f} {new_rate:>15.1f} {previous:>16}")
+    print()
+
+
+def make_pdf(pages: int, lines_per_page: int = 50, seed: int = 0) -> bytes:
+    """A text-only PDF of wrapped paper-like lines (Helvetica, one content stream per page)"""
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = textwrap.wrap(make_document(rng.randrange(10 ** 6), paragraphs=6), 95)[:lines_per_page]
+        body = "".join(f"({line}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 780 Td {body}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, obj))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def benchmark_extraction(pdfs, worker_counts=(1, 2, 4)):
+    """extract_text_from_pdf wall time, serial vs page-parallel"""
+    print("=" * 70)
+    print(f" BENCHMARK: PDF extraction, serial vs process pool ({os.cpu_count()} CPUs)")
+    print("=" * 70)
+    print(f"\n{'input':<24} {'pages':>6} " + " ".join(f"{f'{n} worker(s)':>12}" for n in worker_counts))
+
+    # Time the pool on every file, including those under the serial threshold
+    min_pages = pdf_utils.PARALLEL_MIN_PAGES
+    pdf_utils.PARALLEL_MIN_PAGES = 0
+    try:
+        for label, data in pdfs:
+            timings = []
+            outputs = set()
+            for workers in worker_counts:
+                start = time.time()
+                outputs.add(extract_text_from_pdf(io.BytesIO(data), track=False, workers=workers))
+                timings.append(time.time() - start)
+            pages = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+            print(f"{label:<24} {pages:>6} " + " ".join(f"{t:>11.2f}s" for t in timings)
+                  + ("" if len(outputs) == 1 else "  OUTPUT DIFFERS"))
+    finally:
+        pdf_utils.PARALLEL_MIN_PAGES = min_pages
+    print(f"\n Default: serial (PDF_EXTRACT_WORKERS={pdf_utils.EXTRACT_WORKERS}); with more workers, "
+          f"serial below {min_pages} pages (PDF_PARALLEL_MIN_PAGES)\n")
+
+
+def raw_pdf_text(path: str) -> str:
+    """Uncleaned text of every page, as extract_text_from_pdf sees it"""
+    reader = PyPDF2.PdfReader(path)
+    return "".join((page.extract_text() or "") + "\n" for page in reader.pages)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        inputs = [(path.split('/')[-1][:24], raw_pdf_text(path)) for path in sys.argv[1:]]
+        pdfs = []
+        for path in sys.argv[1:]:
+            with open(path, 'rb') as f:
+                pdfs.append((path.split('/')[-1][:24], f.read()))
+    else:
+        inputs = [(f"synthetic {mb} MB", make_extracted_text(mb)) for mb in (1, 4, 16)]
+        pdfs = [(f"generated {pages} pages", make_pdf(pages)) for pages in (16, 100, 300)]
+
+    benchmark_cleaning(inputs)
+    benchmark_extraction(pdfs)
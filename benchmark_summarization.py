@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for PDF summarization (serial loop vs concurrent map-reduce,
+tree reduce, extractive pre-selection, section-aware chunking).
+Run: python benchmark_summarization.py [pages] [--live]
+
+Without --live the LLM is simulated: each call sleeps in proportion to its
+prompt length and the server handles OLLAMA_NUM_PARALLEL calls at a time.
+With --live the local Ollama server is used (response cache bypassed).
+"""
+
+import os
+import random
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmark_rag import make_document
+from chunk_service import SECTION_MIN_SIZE
+from ollama_client import get_ollama_client
+from pdf_summarizer import (COMBINE_PROMPT, DEFAULT_WORKERS, REDUCE_TOKEN_BUDGET,
+                            llm_summarize, summarize_document, summarize_sections, tree_reduce)
+from extractive import select_sentences
+from section_chunker import SectionChunker
+from summary_store import SummaryStore
+
+
+PAPER_SECTIONS = ["Abstract", "1 Introduction", "2 Related Work", "3 Method", "3.1 Model Architecture",
+                  "3.2 Training Objective", "4 Experiments", "4.1 Experimental Setup", "5 Results",
+                  "6 Discussion", "7 Conclusion"]
+
+
+def make_paper(pages: int = 40, seed: int = 0, width: int = 90) -> str:
+    """Synthetic paper as PyPDF2 extracts it: headings, hard-wrapped lines, no blank lines"""
+    rng = random.Random(seed)
+    per_section = max(1, pages * 3000 // len(PAPER_SECTIONS) // 600)
+    lines = []
+    for s, heading in enumerate(PAPER_SECTIONS):
+        lines.append(heading)
+        for p in range(per_section):
+            paragraph = make_document(seed * 1000 + s * 100 + p, paragraphs=1)
+            lines.extend(textwrap.wrap(paragraph, width))
+    return "\n".join(lines)
+
+
+class SimulatedLLM:
+    """Stand-in for Ollama with fixed per-call overhead and bounded parallelism"""
+
+    def __init__(self, parallel: int = DEFAULT_WORKERS, overhead: float = 0.05,
+                 seconds_per_1k_chars: float = 0.02):
+        self.overhead = overhead
+        self.seconds_per_1k_chars = seconds_per_1k_chars
+        self.calls = 0
+        self._slots = threading.Semaphore(parallel)
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str) -> str:
+        with self._slots:
+            time.sleep(self.overhead + self.seconds_per_1k_chars * len(prompt) / 1000)
+        with self._lock:
+            self.calls += 1
+        return f"Summary of {len(prompt)} chars: " + prompt[-200:]
+
+
+def benchmark_map_reduce(pages: int = 40, live: bool = False, workers: int = DEFAULT_WORKERS):
+    """Wall time of the old serial loop (workers=1) vs concurrent map calls"""
+    print("=" * 70)
+    print(f" BENCHMARK: PDF summarization, serial vs {workers} workers"
+          f" ({'live Ollama' if live else 'simulated LLM'})")
+    print("=" * 70)
+
+    # Roughly 3000 characters per page
+    text = "\n\n".join(make_document(page, paragraphs=7) for page in range(pages))
+
+    if live:
+        get_ollama_client().use_cache = False
+
+    timings = {}
+    for label, n in (("serial", 1), ("concurrent", workers)):
+        summarize_fn = llm_summarize if live else SimulatedLLM()
+        start = time.time()
+        # Fresh checkpoint store so neither run resumes from the other
+        store = SummaryStore(os.path.join(tempfile.mkdtemp(prefix="athena_bench_"), "summaries.sqlite"))
+        result = summarize_document(text, workers=n, summarize_fn=summarize_fn, store=store)
+        timings[label] = time.time() - start
+        print(f"\n {label:<11} {len(result.section_summaries)} sections, {len(result.failed)} failed: "
+              f"map {result.map_seconds:.2f}s + reduce {result.reduce_seconds:.2f}s "
+              f"= {timings[label]:.2f}s")
+
+    print(f"\n Speedup: {timings['serial'] / timings['concurrent']:.1f}x\n")
+    return timings
+
+
+def benchmark_tree_reduce(num_summaries: int = 64, summary_chars: int = 3000,
+                          workers: int = DEFAULT_WORKERS):
+    """One combine prompt over every summary vs budget-sized groups reduced level by level"""
+    print("=" * 70)
+    print(f" BENCHMARK: reduce {num_summaries} summaries, single prompt vs tree")
+    print("=" * 70)
+
+    summaries = [make_document(i, paragraphs=6)[:summary_chars] for i in range(num_summaries)]
+    prompt = COMBINE_PROMPT.format(text="\n\n".join(summaries))
+
+    llm = SimulatedLLM(parallel=workers)
+    start = time.time()
+    llm(prompt)
+    single = time.time() - start
+
+    llm = SimulatedLLM(parallel=workers)
+    start = time.time()
+    _, levels = tree_reduce(summaries, llm, workers)
+    tree = time.time() - start
+
+    print(f"\n single prompt: ~{len(prompt) // 4} tokens (budget {REDUCE_TOKEN_BUDGET}), {single:.2f}s")
+    print(f" tree reduce:   {levels} levels, {llm.calls} calls, {tree:.2f}s\n")
+    return single, tree
+
+
+def benchmark_extractive(pages: int = 40, fractions=(1.0, 0.6, 0.4, 0.25), workers: int = DEFAULT_WORKERS):
+    """Token reduction and end-to-end summary time per pre-selection fraction"""
+    print("=" * 70)
+    print(" BENCHMARK: extractive pre-selection (simulated LLM)")
+    print("=" * 70)
+
+    text = "\n\n".join(make_document(page, paragraphs=7) for page in range(pages))
+
+    # Embed once up front so the timings below show scoring, not model load
+    start = time.time()
+    select_sentences(text, 0.5)
+    print(f"\n First selection (embeds every sentence): {time.time() - start:.2f}s")
+
+    print(f"\n{'kept':>6} {'tokens to LLM':>14} {'reduction':>10} {'select (s)':>11} "
+          f"{'sections':>9} {'total (s)':>10}")
+    for fraction in fractions:
+        store = SummaryStore(os.path.join(tempfile.mkdtemp(prefix="athena_bench_"), "summaries.sqlite"))
+        result = summarize_document(text, workers=workers, summarize_fn=SimulatedLLM(parallel=workers),
+                                    store=store, extract_fraction=fraction)
+        print(f"{fraction:>6.0%} {result.tokens_to_llm:>14} {result.token_reduction:>10.0%} "
+              f"{result.selection_seconds:>11.2f} {len(result.section_summaries):>9} {result.seconds:>10.2f}")
+    print()
+
+
+def benchmark_chunkers(pages: int = 40, sizes=((300, 50), (800, 100), (1500, 100), (2000, 200)),
+                       workers: int = DEFAULT_WORKERS):
+    """Chunk counts, chunks cut mid-sentence and simulated summary time: recursive vs section-aware"""
+    print("=" * 70)
+    print(" BENCHMARK: RecursiveCharacterTextSplitter vs SectionChunker (simulated LLM)")
+    print("=" * 70)
+
+    text = make_paper(pages)
+    print(f"\n {len(text):,} chars, {len(PAPER_SECTIONS)} sections, hard-wrapped lines")
+    print(f"\n{'size':>6} {'splitter':<10} {'chunks':>7} {'avg chars':>10} {'mid-sentence':>13} "
+          f"{'split (ms)':>11} {'summary (s)':>12}")
+
+    for chunk_size, chunk_overlap in sizes:
+        splitters = (
+            ("recursive", RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)),
+            ("section", SectionChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)),
+        )
+        for label, splitter in splitters:
+            start = time.time()
+            chunks = splitter.split_text(text)
+            split_ms = (time.time() - start) * 1000
+            cut = sum(1 for c in chunks if c.rstrip()[-1:] not in ".!?")
+
+            llm = SimulatedLLM(parallel=workers)
+            start = time.time()
+            summaries, _ = summarize_sections(chunks, llm, workers)
+            tree_reduce([s for s in summaries if s], llm, workers)
+            summary_seconds = time.time() - start
+
+            print(f"{chunk_size:>6} {label:<10} {len(chunks):>7} {sum(map(len, chunks)) // max(len(chunks), 1):>10} "
+                  f"{cut:>13} {split_ms:>11.1f} {summary_seconds:>12.2f}")
+    print(f"\n The chunk service uses the recursive splitter below {SECTION_MIN_SIZE} chars "
+          f"(SECTION_CHUNK_MIN_SIZE)\n")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    pages = int(args[0]) if args else 40
+
+    benchmark_map_reduce(pages, live="--live" in sys.argv)
+    benchmark_tree_reduce()
+    benchmark_extractive(pages)
+    benchmark_chunkers(pages)
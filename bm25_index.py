@@ -0,0 +1,249 @@
+# bm25_index.py - In-process BM25 inverted index over the RAG chunks
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Reciprocal rank fusion constant (Cormack et al.)
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens (keeps acronyms like TDR, FAR, BLEU intact)"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuse several ranked lists of ids.
+    Returns [(id, fused_score), ...] sorted by score; ties keep first-seen order.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk rows.
+
+    Postings are kept as int32 (row, term frequency) arrays: a CSR block
+    (offsets / rows / tfs) for everything saved or compacted, plus small
+    per-term tail segments for rows appended since. Rows must be added in
+    order and line up with the VectorIndex rows. Tombstoned rows are
+    filtered with the caller's mask; their statistics stay in the IDF until
+    the next compaction.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    # Terms in more than this share of the rows do not add candidates of their own
+    COMMON_DF = 0.1
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._rows = np.empty(0, dtype=np.int32)
+        self._tfs = np.empty(0, dtype=np.int32)
+        self._tail: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._lengths = np.empty(0, dtype=np.int32)
+        self._size = 0
+        self._total_length = 0
+        self._norms: Optional[np.ndarray] = None  # per-row length normalization, cached
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, start_row: int, texts: List[str]):
+        """Index texts as rows start_row, start_row + 1, ..."""
+        if start_row != self._size:
+            raise ValueError(f"Expected rows to start at {self._size}, got {start_row}")
+
+        term_rows: Dict[int, List[int]] = {}
+        term_tfs: Dict[int, List[int]] = {}
+        lengths = np.empty(len(texts), dtype=np.int32)
+
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[i] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                tid = self.vocab.setdefault(term, len(self.vocab))
+                term_rows.setdefault(tid, []).append(start_row + i)
+                term_tfs.setdefault(tid, []).append(tf)
+
+        for tid, rows in term_rows.items():
+            self._tail.setdefault(tid, []).append((
+                np.array(rows, dtype=np.int32),
+                np.array(term_tfs[tid], dtype=np.int32)
+            ))
+
+        end = start_row + len(texts)
+        if end > len(self._lengths):
+            grown = np.empty(max(end, 2 * len(self._lengths), 64), dtype=np.int32)
+            grown[:self._size] = self._lengths[:self._size]
+            self._lengths = grown
+        self._lengths[start_row:end] = lengths
+        self._size = end
+        self._total_length += int(lengths.sum())
+        self._norms = None
+
+    def _postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, tfs) of a term, sorted by row"""
+        if tid < len(self._offsets) - 1:
+            lo, hi = self._offsets[tid], self._offsets[tid + 1]
+            rows, tfs = self._rows[lo:hi], self._tfs[lo:hi]
+        else:
+            rows = tfs = np.empty(0, dtype=np.int32)
+
+        tail = self._tail.get(tid)
+        if not tail:
+            return rows, tfs
+
+        if len(tail) > 1:
+            # Merge tail segments once so later lookups are a single concat
+            tail[:] = [(np.concatenate([r for r, _ in tail]), np.concatenate([t for _, t in tail]))]
+        tail_rows, tail_tfs = tail[0]
+        if not len(rows):
+            return tail_rows, tail_tfs
+        return np.concatenate([rows, tail_rows]), np.concatenate([tfs, tail_tfs])
+
+    def _term_scores(self, rows: np.ndarray, tfs: np.ndarray, df: int) -> np.ndarray:
+        """BM25 contribution of one term to the given rows"""
+        idf = np.log(1.0 + (self._size - df + 0.5) / (df + 0.5))
+        return (idf * (self.K1 + 1)) * tfs / (tfs + self._norms[rows])
+
+    def search(self, query: str, k: int = 5, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k rows by BM25 score. Candidates are the rows holding a rare
+        query term (df <= COMMON_DF of the rows); common terms only add to
+        those rows' scores, so a query costs about the length of its rare postings. In a query
+        of common terms only, the rarest one picks the candidates.
+        Returns: [(row_id, score), ...] sorted by score
+        """
+        if self._size == 0 or k <= 0:
+            return []
+
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        postings = [p for p in map(self._postings, sorted(term_ids)) if len(p[0])]
+        if not postings:
+            return []
+
+        if self._norms is None:
+            avg_length = self._total_length / self._size or 1.0
+            lengths = np.asarray(self._lengths[:self._size], dtype=np.float32)
+            self._norms = self.K1 * (1 - self.B + self.B * lengths / avg_length)
+
+        max_df = self.COMMON_DF * self._size
+        rare = [p for p in postings if len(p[0]) <= max_df]
+        common = [p for p in postings if len(p[0]) > max_df]
+        if not rare:
+            common.sort(key=lambda p: len(p[0]))
+            rare, common = common[:1], common[1:]
+
+        if len(rare) == 1:
+            candidates, tfs = rare[0]
+            scores = self._term_scores(candidates, tfs, len(candidates))
+        else:
+            rows = np.concatenate([r for r, _ in rare])
+            contributions = np.concatenate([self._term_scores(r, t, len(r)) for r, t in rare])
+            candidates, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+
+        if mask is not None:
+            live = mask[candidates]
+            candidates, scores = candidates[live], scores[live]
+        if not len(candidates):
+            return []
+
+        scores = np.array(scores, dtype=np.float32)
+        for rows, tfs in common:
+            if 8 * len(candidates) < len(rows):
+                # Few candidates: binary search them in the postings
+                pos = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+                hit = rows[pos] == candidates
+                scores[hit] += self._term_scores(candidates[hit], tfs[pos[hit]], len(rows))
+            else:
+                dense = np.zeros(self._size, dtype=np.float32)
+                dense[rows] = self._term_scores(rows, tfs, len(rows))
+                scores += dense[candidates]
+
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def snapshot(self) -> "BM25Index":
+        """Shallow copy that later add() calls won't affect"""
+        copy = BM25Index()
+        copy.vocab = dict(self.vocab)
+        copy._offsets, copy._rows, copy._tfs = self._offsets, self._rows, self._tfs
+        copy._tail = {tid: list(segments) for tid, segments in self._tail.items()}
+        copy._lengths = self._lengths
+        copy._size = self._size
+        copy._total_length = self._total_length
+        return copy
+
+    def compacted(self, keep: np.ndarray) -> "BM25Index":
+        """New index holding only rows where keep is True, renumbered densely"""
+        keep = keep[:self._size]
+        new_ids = (np.cumsum(keep) - 1).astype(np.int32)
+
+        postings = []
+        for tid in range(len(self.vocab)):
+            rows, tfs = self._postings(tid)
+            live = keep[rows]
+            postings.append((new_ids[rows[live]], tfs[live]))
+
+        index = BM25Index()
+        index.vocab = dict(self.vocab)
+        index._set_csr(postings)
+        index._lengths = np.ascontiguousarray(self._lengths[:self._size][keep])
+        index._size = len(index._lengths)
+        index._total_length = int(index._lengths.sum())
+        return index
+
+    def _set_csr(self, postings: List[Tuple[np.ndarray, np.ndarray]]):
+        counts = np.array([len(rows) for rows, _ in postings], dtype=np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._rows = np.concatenate([r for r, _ in postings]).astype(np.int32) if postings else np.empty(0, dtype=np.int32)
+        self._tfs = np.concatenate([t for _, t in postings]).astype(np.int32) if postings else np.empty(0, dtype=np.int32)
+        self._tail = {}
+
+    def save(self, path: str):
+        """Write the postings as one CSR block"""
+        self._set_csr([self._postings(tid) for tid in range(len(self.vocab))])
+
+        np.save(os.path.join(path, "bm25_offsets.npy"), self._offsets)
+        np.save(os.path.join(path, "bm25_rows.npy"), self._rows)
+        np.save(os.path.join(path, "bm25_tfs.npy"), self._tfs)
+        np.save(os.path.join(path, "bm25_lengths.npy"), self._lengths[:self._size])
+        with open(os.path.join(path, "bm25_vocab.json"), 'w', encoding='utf-8') as f:
+            json.dump(sorted(self.vocab, key=self.vocab.get), f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Open postings written by save(); arrays stay memory-mapped"""
+        index = cls()
+        with open(os.path.join(path, "bm25_vocab.json"), encoding='utf-8') as f:
+            index.vocab = {term: tid for tid, term in enumerate(json.load(f))}
+        index._offsets = np.load(os.path.join(path, "bm25_offsets.npy"), mmap_mode='r')
+        index._rows = np.load(os.path.join(path, "bm25_rows.npy"), mmap_mode='r')
+        index._tfs = np.load(os.path.join(path, "bm25_tfs.npy"), mmap_mode='r')
+        index._lengths = np.load(os.path.join(path, "bm25_lengths.npy"))
+        index._size = len(index._lengths)
+        index._total_length = int(index._lengths.sum())
+        return index
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "bm25_vocab.json"))
@@ -2,6 +2,9 @@
 
 import requests
 from datetime import datetime
+from typing import Iterator
+
+from ollama_client import get_ollama_client
 
 
 class AthenaChat:
@@ -11,7 +14,7 @@ class AthenaChat:
         self.model = model
         self.temperature = temperature
         self.chat_history = []
-        self.ollama_url = "http://localhost:11434/api/generate"
+        self.ollama = get_ollama_client()
         self.pdf_context = None  # Store PDF content for context
     
     def set_pdf_context(self, pdf_text: str):
@@ -33,12 +36,50 @@ class AthenaChat:
             Athena's response
         """
         try:
-            # Build conversation context
-            context = self._build_context()
+            prompt = self._build_prompt(user_message)
+            
+            # Call Ollama API
+            response = self.ollama.generate(self.model, prompt, self._options(),
+                                            timeout=120, source="chat", cache=False)
+            
+            if response.status_code != 200:
+                return f"❌ Error: {response.status_code}"
+            
+            data = response.json()
+            assistant_message = data.get("response", "").strip()
+            
+            self._remember(user_message, assistant_message)
             
-            # Create prompt with history and PDF context
-            if self.pdf_context:
-                prompt = f"""You are Athena, an AI research assistant. You have access to the user's uploaded document.
+            return assistant_message
+            
+        except Exception as e:
+            return self._error_message(e)
+    
+    def chat_stream(self, user_message: str) -> Iterator[str]:
+        """
+        Streaming variant of chat(): yields Athena's response as it is
+        generated. The exchange is saved to history once it completes.
+        """
+        assistant_message = ""
+        try:
+            prompt = self._build_prompt(user_message)
+            for token in self.ollama.stream(self.model, prompt, self._options(), source="chat",
+                                          cache=False):
+                assistant_message += token
+                yield token
+        except Exception as e:
+            yield ("\n\n" if assistant_message else "") + self._error_message(e)
+            return
+        
+        self._remember(user_message, assistant_message.strip())
+    
+    def _build_prompt(self, user_message: str) -> str:
+        """Create prompt with history and PDF context"""
+        # Build conversation context
+        context = self._build_context()
+        
+        if self.pdf_context:
+            return f"""You are Athena, an AI research assistant. You have access to the user's uploaded document.
 
 IMPORTANT: When answering questions about the document, ONLY use information from the DOCUMENT CONTENT below. 
 Do NOT make up or hallucinate information. If the document doesn't contain the answer, say so clearly.
@@ -50,48 +91,34 @@ DOCUMENT CONTENT:
 
 User: {user_message}
 Athena:"""
-            else:
-                prompt = f"""You are Athena, an AI research assistant. You're knowledgeable, helpful, and professional.
+        
+        return f"""You are Athena, an AI research assistant. You're knowledgeable, helpful, and professional.
 
 {context}
 
 User: {user_message}
 Athena:"""
-            
-            # Call Ollama API
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": self.temperature,
-                    "num_predict": 500
-                }
-            }
-            
-            response = requests.post(self.ollama_url, json=payload, timeout=120)
-            
-            if response.status_code != 200:
-                return f"❌ Error: {response.status_code}"
-            
-            data = response.json()
-            assistant_message = data.get("response", "").strip()
-            
-            # Save to history
-            self.chat_history.append({
-                'timestamp': datetime.now(),
-                'user': user_message,
-                'assistant': assistant_message
-            })
-            
-            return assistant_message
-            
-        except requests.exceptions.ConnectionError:
+    
+    def _options(self):
+        return {
+            "temperature": self.temperature,
+            "num_predict": 500
+        }
+    
+    def _remember(self, user_message: str, assistant_message: str):
+        """Save exchange to history"""
+        self.chat_history.append({
+            'timestamp': datetime.now(),
+            'user': user_message,
+            'assistant': assistant_message
+        })
+    
+    def _error_message(self, e: Exception) -> str:
+        if isinstance(e, requests.exceptions.ConnectionError):
             return "❌ Could not connect to Ollama. Make sure it's running: `ollama serve`"
-        except requests.exceptions.Timeout:
+        if isinstance(e, requests.exceptions.Timeout):
             return "❌ Request timed out. The model is taking too long to respond."
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
+        return f"❌ Error: {str(e)}"
     
     def _build_context(self):
         """Build conversation context from history"""
@@ -0,0 +1,173 @@
+# chunk_service.py - Memoized text splitting shared by every index and the summarizer
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from hashing import content_hash
+from section_chunker import SectionChunker
+
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("CHUNK_CACHE_ENTRIES", "64"))
+
+# Below this chunk size SectionChunker's whole-sentence chunks outnumber
+# RecursiveCharacterTextSplitter's, so small chunks (semantic search,
+# hierarchical index children) keep the recursive splitter
+SECTION_MIN_SIZE = int(os.getenv("SECTION_CHUNK_MIN_SIZE", "600"))
+
+
+def splitter_name(chunk_size: int) -> str:
+    """Splitter used at chunk_size: 'section' (SectionChunker) or 'recursive'"""
+    return "section" if chunk_size >= SECTION_MIN_SIZE else "recursive"
+
+
+def _recursive_spans(text: str, chunk_size: int, chunk_overlap: int) -> List[Tuple[int, int]]:
+    """RecursiveCharacterTextSplitter chunks as (start, end) offsets into text"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    spans = []
+    for chunk in splitter.split_text(text):
+        # A chunk repeats at most chunk_overlap characters of the previous one
+        if spans:
+            prev_start, prev_end = spans[-1]
+            pos = max(prev_start + 1, prev_end - chunk_overlap)
+        else:
+            pos = 0
+        start = text.find(chunk, pos)
+        if start < 0:
+            start = text.find(chunk)
+        if start < 0:
+            raise ValueError("Splitter returned a chunk that is not part of the text")
+        spans.append((start, start + len(chunk)))
+    return spans
+
+
+class ChunkSet(Sequence):
+    """
+    Chunks of one text as (start, end) offsets into that text. Chunk
+    strings are sliced out only when read, so cached chunk sets hold one
+    copy of the text however many sizes it was split at.
+    """
+
+    def __init__(self, text: str, spans: np.ndarray):
+        self.text = text
+        self.spans = spans  # (n, 2) int64
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(i, slice):
+            return [self.text[s:e] for s, e in self.spans[i].tolist()]
+        start, end = self.spans[i]
+        return self.text[start:end]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self.text
+        for start, end in self.spans.tolist():
+            yield text[start:end]
+
+    def texts(self) -> List[str]:
+        return list(self)
+
+
+class ChunkService:
+    """
+    Chunk sets keyed by (text hash, chunk_size, chunk_overlap, splitter),
+    kept in memory with least recently used eviction. The summary flow,
+    the QA and semantic indexes and AdvancedRAG split the same PDF text,
+    so every split after the first is a dictionary lookup. Equal texts
+    share one string across all their chunk sets.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._entries: "OrderedDict[Tuple, Tuple[ChunkSet, float]]" = OrderedDict()
+        self._texts: Dict[str, Tuple[str, int]] = {}  # hash -> (shared text, chunk sets using it)
+        self._lock = threading.Lock()
+
+    def split(self, text: str, chunk_size: int, chunk_overlap: int) -> ChunkSet:
+        """Chunks of text, computed once per text and split parameters"""
+        digest = content_hash(text)
+        splitter = splitter_name(chunk_size)
+        key = (digest, chunk_size, chunk_overlap, splitter)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.seconds_saved += entry[1]
+                return entry[0]
+            shared = self._texts.get(digest)
+
+        # Split outside the lock; a concurrent miss on the same key only costs a duplicate split
+        start = time.time()
+        if splitter == "section":
+            spans = SectionChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_spans(text)
+        else:
+            spans = _recursive_spans(text, chunk_size, chunk_overlap)
+        chunks = ChunkSet(shared[0] if shared else text, np.asarray(spans, dtype=np.int64).reshape(-1, 2))
+        seconds = time.time() - start
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = (chunks, seconds)
+                text, users = self._texts.get(digest, (chunks.text, 0))
+                self._texts[digest] = (text, users + 1)
+                self._evict()
+            return self._entries[key][0]
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            (digest, *_), _ = self._entries.popitem(last=False)
+            text, users = self._texts[digest]
+            if users > 1:
+                self._texts[digest] = (text, users - 1)
+            else:
+                del self._texts[digest]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'texts': len(self._texts),
+                'text_chars': sum(len(t) for t, _ in self._texts.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'seconds_saved': round(self.seconds_saved, 3)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._texts.clear()
+
+
+_service: Optional[ChunkService] = None
+_service_lock = threading.Lock()
+
+
+def get_chunk_service() -> ChunkService:
+    """Process-wide chunk service"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ChunkService()
+        return _service
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int) -> ChunkSet:
+    """Chunks of text from the process-wide chunk service"""
+    return get_chunk_service().split(text, chunk_size, chunk_overlap)
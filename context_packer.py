@@ -0,0 +1,177 @@
+# context_packer.py - Token-budgeted, overlap-aware packing of retrieved chunks into a prompt
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+
+# Rough chars-per-token ratio for English text with Llama-style tokenizers
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Spans that would be cut below this many tokens are skipped instead
+MIN_SPAN_TOKENS = 40
+
+# Shorter suffix/prefix matches are treated as coincidence, not overlap
+MIN_OVERLAP_CHARS = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (no tokenizer needed)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def merge_overlap(first: str, second: str) -> Tuple[str, int]:
+    """
+    Join two consecutive chunks, dropping the longest suffix of first that
+    second starts with. Returns (merged text, overlap length).
+    """
+    for size in range(min(len(first), len(second)), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:], size
+    return first + " " + second, 0
+
+
+@dataclass
+class Span:
+    """Merged run of chunks from one document"""
+    doc_id: str
+    doc_title: str
+    chunk_indices: List[int]
+    text: str
+    similarity: float
+    rank: int
+    metadata: Dict = field(default_factory=dict)
+
+
+@dataclass
+class PackedContext:
+    """Prompt context produced by pack_context()"""
+    text: str
+    spans: List[Span]
+    tokens: int
+    naive_tokens: int
+    dropped_chunks: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.naive_tokens - self.tokens, 0)
+
+
+def _source_block(i: int, span: Span) -> str:
+    return f"[Source {i} - {span.doc_title}]:\n{span.text}"
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, preferring a sentence then a word boundary"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"))
+    if sentence_end > limit // 2:
+        return cut[:sentence_end + 1]
+    # Leave room for the " ..." marker
+    cut = cut[:limit - 4]
+    return cut[:cut.rfind(" ")] + " ..." if " " in cut else text[:limit]
+
+
+def merge_chunks(contexts: List[Tuple[str, Dict, float]]) -> Tuple[List[Span], int]:
+    """
+    Merge retrieved (text, metadata, similarity) chunks into spans:
+    consecutive chunks of a document become one span with the shared
+    overlap removed, and chunks whose text is already contained in another
+    span are dropped. Spans are returned in order of their best-ranked chunk.
+    Returns (spans, number of chunks dropped as redundant).
+    """
+    by_doc: Dict[str, List[Tuple[int, int, str, Dict, float]]] = {}
+    for rank, (text, metadata, similarity) in enumerate(contexts):
+        doc_id = metadata.get('doc_id')
+        by_doc.setdefault(doc_id, []).append(
+            (metadata.get('chunk_index', rank), rank, text, metadata, similarity)
+        )
+
+    spans: List[Span] = []
+    for doc_id, chunks in by_doc.items():
+        chunks.sort(key=lambda c: c[0])
+        current = None
+        for chunk_index, rank, text, metadata, similarity in chunks:
+            if current is not None and chunk_index == current.chunk_indices[-1]:
+                continue  # same chunk retrieved twice
+            if current is not None and chunk_index == current.chunk_indices[-1] + 1:
+                current.text, _ = merge_overlap(current.text, text)
+                current.chunk_indices.append(chunk_index)
+                current.similarity = max(current.similarity, similarity)
+                current.rank = min(current.rank, rank)
+                continue
+            current = Span(doc_id, metadata.get('doc_title', 'Unknown'), [chunk_index],
+                           text, similarity, rank, metadata)
+            spans.append(current)
+
+    spans.sort(key=lambda s: s.rank)
+
+    # Drop spans repeated inside a better-ranked span (e.g. duplicate documents)
+    kept: List[Span] = []
+    normalized: List[str] = []
+    dropped = 0
+    for span in spans:
+        norm = _normalize(span.text)
+        if any(norm in other for other in normalized):
+            dropped += len(span.chunk_indices)
+            continue
+        kept.append(span)
+        normalized.append(norm)
+
+    return kept, dropped
+
+
+def pack_context(contexts: List[Tuple[str, Dict, float]],
+                 token_budget: int = DEFAULT_TOKEN_BUDGET) -> PackedContext:
+    """
+    Build the prompt context from ranked (text, metadata, similarity)
+    chunks within token_budget, merging overlapping neighbours first.
+    naive_tokens is the size of the verbatim one-block-per-chunk context
+    this replaces, so tokens_saved includes what the budget cut off.
+    """
+    naive = "\n\n".join(
+        f"[Source {i} - {metadata.get('doc_title', 'Unknown')}]:\n{text}"
+        for i, (text, metadata, _) in enumerate(contexts, 1)
+    )
+
+    spans, dropped = merge_chunks(contexts)
+
+    blocks: List[str] = []
+    packed: List[Span] = []
+    used = 0
+    for span in spans:
+        separator = 2 if blocks else 0
+        block = _source_block(len(packed) + 1, span)
+        cost = estimate_tokens(block) + separator
+
+        if used + cost > token_budget:
+            header = estimate_tokens(_source_block(len(packed) + 1, Span(
+                span.doc_id, span.doc_title, [], "", 0.0, 0))) + separator
+            room = token_budget - used - header
+            if room < MIN_SPAN_TOKENS:
+                dropped += len(span.chunk_indices)
+                continue
+            span.text = _truncate(span.text, room)
+            block = _source_block(len(packed) + 1, span)
+            cost = estimate_tokens(block) + separator
+
+        blocks.append(block)
+        packed.append(span)
+        used += cost
+
+    text = "\n\n".join(blocks)
+    return PackedContext(
+        text=text,
+        spans=packed,
+        tokens=estimate_tokens(text),
+        naive_tokens=estimate_tokens(naive),
+        dropped_chunks=dropped
+    )
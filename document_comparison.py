@@ -1,33 +1,24 @@
 
-import requests
 from typing import Dict, List, Tuple, Set
 from collections import Counter
 import numpy as np
 import re
 
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-    embeddings_class = HuggingFaceEmbeddings
-except ImportError:
-    from langchain_community.embeddings import SentenceTransformerEmbeddings
-    embeddings_class = SentenceTransformerEmbeddings
-
 from sklearn.metrics.pairwise import cosine_similarity
 
+from embedding_cache import CachedEmbeddings
+from ollama_client import get_ollama_client
+
 
 class DocumentComparison:
     """Advanced document comparison with deep insights"""
     
     def __init__(self, model="llama3"):
         self.model = model
-        self.ollama_url = "http://localhost:11434/api/generate"
+        self.ollama = get_ollama_client()
         self.documents = {}
         
-        try:
-            self.embeddings_model = embeddings_class(model_name="all-MiniLM-L6-v2")
-        except:
-            from langchain_community.embeddings import SentenceTransformerEmbeddings
-            self.embeddings_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+        self.embeddings_model = CachedEmbeddings("all-MiniLM-L6-v2")
         
         # Comprehensive technology taxonomy
         self.tech_categories = {
@@ -78,7 +69,7 @@ class DocumentComparison:
     def _check_ollama(self) -> bool:
         """Check Ollama availability"""
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=3)
+            response = self.ollama.get("/api/tags", timeout=3)
             if response.status_code == 200:
                 models = response.json().get('models', [])
                 has_llama = any('llama3' in m.get('name', '') for m in models)
@@ -92,8 +83,8 @@ class DocumentComparison:
     def get_semantic_similarity(self, text1: str, text2: str) -> float:
         """Calculate semantic similarity"""
         try:
-            emb1 = self.embeddings_model.embed_query(text1[:8000])
-            emb2 = self.embeddings_model.embed_query(text2[:8000])
+            # One batch; documents compared before come straight from the cache
+            emb1, emb2 = self.embeddings_model.embed_documents([text1[:8000], text2[:8000]])
             return float(cosine_similarity([emb1], [emb2])[0][0])
         except:
             return 0.0
@@ -415,15 +406,12 @@ Provide:
 
 Be specific with technologies, projects, and qualifications mentioned."""
 
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.3, "num_predict": 800, "num_ctx": 4096}
-            }
-            
             print("   Waiting for AI analysis...")
-            response = requests.post(self.ollama_url, json=payload, timeout=90)
+            response = self.ollama.generate(
+                self.model, prompt,
+                {"temperature": 0.3, "num_predict": 800, "num_ctx": 4096},
+                timeout=90, source="document_comparison", cache=True
+            )
             
             if response.status_code == 200:
                 data = response.json()
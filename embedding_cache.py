@@ -0,0 +1,141 @@
+# embedding_cache.py - Disk-backed, content-addressed cache for text embeddings
+
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from hashing import content_hash
+from model_registry import get_embedding_model
+from sqlite_store import SQLiteLRUStore, process_wide
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.getenv("CACHE_DIR", ".cache"), "embeddings.sqlite")
+DEFAULT_MAX_BYTES = int(float(os.getenv("EMBEDDING_CACHE_MB", "512")) * 1024 * 1024)
+
+
+class EmbeddingCache(SQLiteLRUStore):
+    """
+    Embeddings keyed by (model name, text hash), stored as float32 blobs in
+    SQLite so they survive restarts and can be shared between processes.
+    Least recently used entries are evicted once the cache exceeds
+    max_bytes. hits / misses are counted per process (see stats()).
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        " model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL,"
+        " last_used REAL NOT NULL, PRIMARY KEY (model, hash))",
+        "CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)",
+    )
+    TABLE = "embeddings"
+    SIZE_COLUMN = "vector"
+    KEY_COLUMNS = ("model", "hash")
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for the given text hashes (missing ones are left out)"""
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+
+                if rows:
+                    self._db.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND hash IN ({placeholders})",
+                        [time.time(), model, *batch]
+                    )
+            self._db.commit()
+
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]):
+        """Store vectors by text hash, evicting old entries if over budget"""
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (model, h, np.asarray(v, dtype=np.float32).tobytes(), now)
+            for h, v in items.items()
+        ]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+            self._grew(sum(len(r[2]) for r in rows))
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings wrapper that goes through an EmbeddingCache.
+    Only texts not seen before (for this model) are sent to the model, in
+    a single batch. The model is fetched from the process-wide registry
+    on the first miss, so all wrappers share one loaded copy.
+    Query embeddings are cached under a separate key since some models
+    encode queries differently from documents.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2",
+                 loader: Optional[Callable[[str], Embeddings]] = None,
+                 cache: Optional[EmbeddingCache] = None):
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+        self._loader = loader
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """The shared underlying model (loaded on first use)"""
+        return get_embedding_model(self.model_name, self._loader)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, self.model_name,
+                           lambda t: self.embeddings.embed_documents(t))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], f"{self.model_name}#query",
+                           lambda t: [self.embeddings.embed_query(t[0])])[0]
+
+    def _embed(self, texts: List[str], key: str, embed_fn) -> List[List[float]]:
+        if not texts:
+            return []
+
+        hashes = [content_hash(t) for t in texts]
+        found = self.cache.get_many(key, hashes)
+
+        # Embed each missing text once, even if it repeats in the batch
+        missing = {h: t for h, t in zip(hashes, texts) if h not in found}
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = {h: np.asarray(v, dtype=np.float32) for h, v in zip(missing, vectors)}
+            self.cache.put_many(key, computed)
+            found.update(computed)
+
+        return [found[h].tolist() for h in hashes]
+
+
+_shared_cache = process_wide(EmbeddingCache)
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache"""
+    return _shared_cache()
@@ -0,0 +1,133 @@
+# extractive.py - Extractive sentence pre-selection to shrink LLM input
+
+import re
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from context_packer import estimate_tokens
+from embedding_cache import CachedEmbeddings
+
+
+# Score = CENTRALITY_WEIGHT * centrality + POSITION_WEIGHT * position
+CENTRALITY_WEIGHT = 0.7
+POSITION_WEIGHT = 0.3
+
+# Sentences shorter than this (page numbers, stray headings) are never selected
+MIN_SENTENCE_CHARS = 25
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\[(])")
+
+
+@dataclass
+class Selection:
+    """Output of select_sentences()"""
+    text: str
+    sentences_total: int
+    sentences_kept: int
+    tokens_before: int
+    tokens_after: int
+    seconds: float
+
+    @property
+    def token_reduction(self) -> float:
+        """Fraction of input tokens removed"""
+        return 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+
+def split_sentences(text: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Split text into sentences. Returns (sentences, paragraph id of each
+    sentence, position of each sentence within its paragraph).
+    """
+    sentences: List[str] = []
+    paragraph_ids: List[int] = []
+    ranks: List[int] = []
+    for p, paragraph in enumerate(_PARAGRAPH_BREAK.split(text)):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        for r, sentence in enumerate(_SENTENCE_END.split(paragraph)):
+            sentences.append(sentence)
+            paragraph_ids.append(p)
+            ranks.append(r)
+    return sentences, np.asarray(paragraph_ids, dtype=np.int32), np.asarray(ranks, dtype=np.float32)
+
+
+def score_sentences(vectors: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """
+    Score sentences from their embeddings (n x dim) and position within
+    their paragraph.
+
+    Centrality is each sentence's mean cosine similarity to all others,
+    which equals the dot product with the mean of the normalized vectors,
+    so it costs O(n * dim) instead of building the n x n similarity matrix.
+    Position favours the opening sentences of paragraphs / sections and
+    the start and end of the document (abstract, conclusion).
+    """
+    n = len(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+
+    centrality = unit @ unit.mean(axis=0)
+    spread = centrality.max() - centrality.min()
+    centrality = (centrality - centrality.min()) / spread if spread > 0 else np.ones(n)
+
+    offset = np.arange(n, dtype=np.float32) / max(n - 1, 1)
+    document_position = np.abs(offset - 0.5) * 2  # 1 at both ends, 0 in the middle
+    position = 0.7 / (1 + ranks) + 0.3 * document_position
+
+    return CENTRALITY_WEIGHT * centrality + POSITION_WEIGHT * position
+
+
+def select_sentences(text: str, fraction: float = 0.4,
+                     embeddings: Optional[CachedEmbeddings] = None) -> Selection:
+    """
+    Keep the highest scoring sentences covering about `fraction` of the
+    text's characters, in document order and with paragraph breaks kept.
+    Uses the shared MiniLM model through the embedding cache.
+    """
+    start = time.time()
+    sentences, paragraph_ids, ranks = split_sentences(text)
+    tokens_before = estimate_tokens(text)
+
+    if fraction >= 1 or len(sentences) < 2:
+        return Selection(text, len(sentences), len(sentences), tokens_before, tokens_before,
+                         time.time() - start)
+
+    embeddings = embeddings or CachedEmbeddings("all-MiniLM-L6-v2")
+    vectors = np.asarray(embeddings.embed_documents(sentences), dtype=np.float32)
+
+    lengths = np.fromiter((len(s) for s in sentences), dtype=np.int64, count=len(sentences))
+    scores = score_sentences(vectors, ranks)
+    scores[lengths < MIN_SENTENCE_CHARS] = -np.inf
+
+    # Best sentences first, until the character budget is used
+    order = np.argsort(-scores, kind="stable")
+    within = np.cumsum(lengths[order]) <= fraction * lengths.sum()
+    within[0] = True
+    keep = np.sort(order[within & np.isfinite(scores[order])])
+    if not len(keep):
+        return Selection(text, len(sentences), len(sentences), tokens_before, tokens_before,
+                         time.time() - start)
+
+    paragraphs: List[List[str]] = []
+    last = None
+    for i in keep:
+        if paragraph_ids[i] != last:
+            paragraphs.append([])
+            last = paragraph_ids[i]
+        paragraphs[-1].append(sentences[i])
+    selected = "\n\n".join(" ".join(p) for p in paragraphs)
+
+    return Selection(
+        text=selected,
+        sentences_total=len(sentences),
+        sentences_kept=len(keep),
+        tokens_before=tokens_before,
+        tokens_after=estimate_tokens(selected),
+        seconds=time.time() - start
+    )
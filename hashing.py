@@ -0,0 +1,11 @@
+# hashing.py - Content addresses shared by the caches, stores and indexes
+
+import hashlib
+from typing import Union
+
+
+def content_hash(data: Union[str, bytes]) -> str:
+    """Content address of a text or byte string (sha1 hex of its UTF-8 bytes)"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
@@ -0,0 +1,129 @@
+# hierarchical_index.py - Small chunks embedded once, larger parent windows scored from them
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from chunk_service import split_text
+from embedding_cache import CachedEmbeddings
+from hashing import content_hash
+
+
+CHILD_SIZE = 300
+CHILD_OVERLAP = 50
+
+DEFAULT_MAX_INDEXES = int(os.getenv("HIERARCHICAL_INDEX_ENTRIES", "4"))
+
+
+class HierarchicalIndex:
+    """
+    Multi-granularity index over one document. The text is split into
+    small child chunks that are embedded once; parent windows of any size
+    are cut from the same text (through the chunk service) and scored by
+    their best matching child, so no text is embedded twice. The Semantic
+    Search tab searches the children, the Q&A tab retrieves parents.
+    """
+
+    def __init__(self, text: str, child_size: int = CHILD_SIZE, child_overlap: int = CHILD_OVERLAP,
+                 embedding_model: str = "all-MiniLM-L6-v2"):
+        start = time.time()
+        self.text = text
+        self.child_size = child_size
+        self.child_overlap = child_overlap
+        self.embeddings = CachedEmbeddings(embedding_model)
+
+        chunks = split_text(text, child_size, child_overlap)
+        keep = [i for i, chunk in enumerate(chunks) if chunk.strip()]
+        self.child_spans = chunks.spans[keep]
+        # Whitespace-normalized, as shown in search results
+        self.child_texts = [' '.join(chunks[i].split()) for i in keep]
+
+        vectors = np.asarray(self.embeddings.embed_documents(self.child_texts), dtype=np.float32)
+        self.child_vectors = vectors.reshape(len(self.child_texts), -1)
+        norms = np.linalg.norm(self.child_vectors, axis=1, keepdims=True)
+        self._unit = self.child_vectors / np.where(norms == 0, 1, norms)
+
+        self._parents: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.build_seconds = time.time() - start
+
+    def __len__(self) -> int:
+        return len(self.child_texts)
+
+    def parents(self, parent_size: int, parent_overlap: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parent window spans (p x 2) and their child membership (p x n bool).
+        A child belongs to every window holding at least half of it (or half
+        of the window, for windows smaller than a child).
+        """
+        key = (parent_size, parent_overlap)
+        with self._lock:
+            if key not in self._parents:
+                spans = split_text(self.text, parent_size, parent_overlap).spans
+                children = self.child_spans
+                overlap = (np.minimum(spans[:, 1:2], children[:, 1]) -
+                           np.maximum(spans[:, 0:1], children[:, 0]))
+                shorter = np.minimum(spans[:, 1:2] - spans[:, 0:1], children[:, 1] - children[:, 0])
+                self._parents[key] = (spans, (overlap > 0) & (2 * overlap >= shorter))
+            return self._parents[key]
+
+    def child_scores(self, query: str) -> np.ndarray:
+        """Cosine similarity of the query to every child chunk"""
+        q = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(q)
+        return self._unit @ (q / norm if norm else q)
+
+    def search_parents(self, query: str, k: int, parent_size: int,
+                       parent_overlap: int) -> List[Tuple[str, float]]:
+        """Top k parent windows as [(text, score), ...], score = best child similarity"""
+        spans, members = self.parents(parent_size, parent_overlap)
+        if not len(spans) or not len(self):
+            return []
+
+        scores = np.where(members, self.child_scores(query), -np.inf).max(axis=1)
+        k = min(k, len(spans))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.text[spans[i, 0]:spans[i, 1]], float(scores[i]))
+                for i in top if np.isfinite(scores[i])]
+
+
+_indexes: "OrderedDict[Tuple[str, int, int, str], HierarchicalIndex]" = OrderedDict()
+_index_locks: Dict[Tuple[str, int, int, str], threading.Lock] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_hierarchical_index(text: str, child_size: int = CHILD_SIZE, child_overlap: int = CHILD_OVERLAP,
+                           embedding_model: str = "all-MiniLM-L6-v2") -> HierarchicalIndex:
+    """
+    Index of text shared by every caller in the process, so the second
+    tab to ask for the same document gets it without embedding anything.
+    Concurrent callers asking for the same document wait for a single
+    build; different documents build in parallel.
+    """
+    key = (content_hash(text), child_size, child_overlap, embedding_model)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+        lock = _index_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        with _indexes_lock:
+            index = _indexes.get(key)
+        if index is not None:
+            return index
+
+        index = HierarchicalIndex(text, child_size, child_overlap, embedding_model)
+
+        with _indexes_lock:
+            _indexes[key] = index
+            _index_locks.pop(key, None)
+            while len(_indexes) > DEFAULT_MAX_INDEXES:
+                _indexes.popitem(last=False)
+        return index
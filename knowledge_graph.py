@@ -1,11 +1,12 @@
 # knowledge_graph.py - FIXED: Proper Research Entity Extraction
 
 import re
-import requests
 from typing import Dict, List, Tuple, Set
 from collections import defaultdict
 import networkx as nx
 
+from ollama_client import get_ollama_client
+
 try:
     from langchain_huggingface import HuggingFaceEmbeddings
     embeddings_class = HuggingFaceEmbeddings
@@ -34,7 +35,7 @@ class KnowledgeGraphBuilder:
     
     def __init__(self, model="llama3"):
         self.model = model
-        self.ollama_url = "http://localhost:11434/api/generate"
+        self.ollama = get_ollama_client()
         self.graph = nx.DiGraph()
         
         # FIXED: Research-focused entity patterns
@@ -4,8 +4,7 @@ import time
 from paper_fetcher import PaperFetcher, ResearchPaper
 from typing import List
 from tracker_integration import get_tracker, get_calc
-
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+from ollama_client import OLLAMA_URL, get_ollama_client
 
 
 def research_topic(topic: str, skip_tools: bool = False, fetch_papers: bool = True, 
@@ -185,21 +184,14 @@ COMPREHENSIVE RESEARCH SUMMARY:"""
                           prompt_length=len(prompt),
                           max_tokens=1500)
         
-        payload = {
-            "model": "llama3",
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.4,
-                "num_predict": 1500,
-                "num_ctx": 8192
-            }
-        }
-        
         print("   Calling Ollama API...")
         
         # Increased timeout with better error handling
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=timeout)
+        response = get_ollama_client().generate(
+            "llama3", prompt,
+            {"temperature": 0.4, "num_predict": 1500, "num_ctx": 8192},
+            timeout=timeout, source="research_summary", cache=True
+        )
         
         llm_duration = time.time() - llm_start
         
@@ -291,17 +283,11 @@ Include:
 Be specific, technical yet accessible. Aim for 600-800 words."""
 
     try:
-        payload = {
-            "model": "llama3",
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.4,
-                "num_predict": 1200
-            }
-        }
-        
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=timeout)
+        response = get_ollama_client().generate(
+            "llama3", prompt,
+            {"temperature": 0.4, "num_predict": 1200},
+            timeout=timeout, source="summary_only", cache=True
+        )
         
         duration = time.time() - start
         
@@ -337,12 +323,12 @@ Ollama might be loading the model for the first time, which can take 1-3 minutes
         
     except requests.exceptions.ConnectionError:
         tracker.add_reward(calc.error_penalty(), "Connection error")
-        return """Error: Cannot connect to Ollama.
+        return f"""Error: Cannot connect to Ollama.
 
 Please ensure:
 1. Ollama is installed (https://ollama.com/download)
 2. Ollama is running (check system tray for Ollama icon)
-3. The API is accessible at http://localhost:11434
+3. The API is accessible at {OLLAMA_URL}
 
 To start Ollama manually, try:
 - Open Ollama from Start Menu
@@ -387,7 +373,7 @@ def _fallback_summary(papers: List[ResearchPaper]) -> str:
 def test_ollama_connection():
     """Test if Ollama is running and llama3 is available"""
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = get_ollama_client().get("/api/tags", timeout=5)
         
         if response.status_code == 200:
             models = response.json().get('models', [])
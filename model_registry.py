@@ -0,0 +1,94 @@
+# model_registry.py - Process-wide registry of loaded embedding models
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+_models: Dict[str, Embeddings] = {}
+_load_stats: Dict[str, Dict] = {}
+_model_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def load_embeddings(model_name: str) -> Embeddings:
+    """Load a sentence-transformers model through LangChain"""
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+    except Exception:
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+        return SentenceTransformerEmbeddings(model_name=model_name)
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident memory of this process, None where it can't be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_embedding_model(model_name: str = "all-MiniLM-L6-v2",
+                        loader: Optional[Callable[[str], Embeddings]] = None) -> Embeddings:
+    """
+    Shared embedding model handle, loaded at most once per process.
+    Concurrent callers asking for the same model wait for a single load;
+    different models load in parallel. Load time and resident memory are
+    logged to the agent tracker.
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        lock = _model_locks.setdefault(model_name, threading.Lock())
+
+    with lock:
+        model = _models.get(model_name)
+        if model is not None:
+            return model
+
+        rss_before = _rss_bytes()
+        start = time.time()
+        model = (loader or load_embeddings)(model_name)
+        duration = time.time() - start
+        rss_after = _rss_bytes()
+
+        stats = {
+            'load_seconds': duration,
+            'memory_mb': (rss_after - rss_before) / (1024 * 1024)
+            if rss_before is not None and rss_after is not None else None,
+            'process_rss_mb': rss_after / (1024 * 1024) if rss_after is not None else None
+        }
+        _load_stats[model_name] = stats
+        _models[model_name] = model
+
+    print(f" Embedding model {model_name} loaded in {duration:.2f}s")
+    _track_load(model_name, stats)
+    return model
+
+
+def _track_load(model_name: str, stats: Dict):
+    try:
+        from tracker_integration import get_tracker
+        get_tracker().log_action("load_embedding_model", model=model_name, **stats)
+    except Exception as e:
+        print(f" Could not record model load: {e}")
+
+
+def loaded_models() -> Dict[str, Dict]:
+    """Load time / memory of every model loaded so far"""
+    with _registry_lock:
+        return {name: dict(stats) for name, stats in _load_stats.items()}
+
+
+def unload_model(model_name: str) -> bool:
+    """Drop the registry's reference to a model (it is reloaded on next use)"""
+    with _registry_lock:
+        _load_stats.pop(model_name, None)
+        return _models.pop(model_name, None) is not None
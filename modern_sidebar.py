@@ -290,8 +290,8 @@ def render_sidebar():
 def check_ollama_status():
     """Check if Ollama is running and which models are available"""
     try:
-        import requests
-        response = requests.get("http://localhost:11434/api/tags", timeout=2)
+        from ollama_client import get_ollama_client
+        response = get_ollama_client().get("/api/tags", timeout=2)
         
         if response.status_code == 200:
             data = response.json()
@@ -0,0 +1,312 @@
+# ollama_client.py - Shared, pooled client for the Ollama API
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from response_cache import ResponseCache, get_response_cache, response_key
+
+
+# Base URL of the Ollama server (docker-compose sets OLLAMA_URL=http://ollama:11434)
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434").rstrip("/")
+GENERATE_URL = f"{OLLAMA_URL}/api/generate"
+TAGS_URL = f"{OLLAMA_URL}/api/tags"
+
+# Read timeout for generation; connecting should never take long
+DEFAULT_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+CONNECT_TIMEOUT = 5.0
+
+# Transient failures (connection refused / reset, overloaded server) are retried
+MAX_RETRIES = 2
+BACKOFF_SECONDS = 0.5
+RETRY_STATUS = (429, 502, 503, 504)
+
+# Keep-alive connections kept per host (one per concurrent caller)
+POOL_SIZE = 8
+
+# ENABLE_CACHE=false always goes to the model (see .env.docker)
+USE_CACHE = os.getenv("ENABLE_CACHE", "true").lower() not in ("false", "0", "no")
+
+
+class OllamaError(Exception):
+    """Ollama answered with an error status or error payload"""
+
+
+class OllamaClient:
+    """
+    Keep-alive HTTP session for Ollama shared by all modules. Requests use
+    uniform (connect, read) timeouts, connection errors and overload
+    statuses are retried with exponential backoff, and every generate call
+    records latency and token counts (per client and in the agent tracker).
+    Successful generations can be stored in a ResponseCache keyed by
+    (model, prompt, options). Only callers whose answers should repeat opt
+    in with cache=True (research, summarization, comparison); by default
+    only deterministic calls (temperature 0) are cached, so sampled
+    answers such as chat replies are never replayed.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_URL, timeout: float = DEFAULT_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, backoff: float = BACKOFF_SECONDS,
+                 pool_size: int = POOL_SIZE, cache: Optional[ResponseCache] = None,
+                 use_cache: bool = USE_CACHE):
+        self.base_url = base_url.rstrip("/")
+        self.generate_url = f"{self.base_url}/api/generate"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.use_cache = use_cache
+        self._cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'errors': 0, 'retries': 0, 'cache_hits': 0, 'seconds': 0.0,
+                       'prompt_tokens': 0, 'completion_tokens': 0}
+
+    @property
+    def cache(self) -> ResponseCache:
+        """Response cache (the process-wide one unless given)"""
+        if self._cache is None:
+            self._cache = get_response_cache()
+        return self._cache
+
+    @staticmethod
+    def _wants_cache(cache: Optional[bool], options: Optional[Dict]) -> bool:
+        """cache=None caches deterministic calls only"""
+        if cache is None:
+            return (options or {}).get("temperature", 0.8) == 0
+        return cache
+
+    def _cached(self, key: str, cache: bool) -> Optional[Dict]:
+        if not (cache and self.use_cache):
+            return None
+        try:
+            return self.cache.get(key)
+        except Exception as e:
+            print(f" Response cache unavailable: {e}")
+            return None
+
+    def _store(self, key: str, model: str, data: Dict, seconds: float, cache: bool):
+        if not (cache and self.use_cache) or not data.get("response", "").strip():
+            return
+        # "context" is the token state for follow-up calls, large and not needed here
+        data = {k: v for k, v in data.items() if k != "context"}
+        try:
+            self.cache.put(key, model, data, seconds)
+        except Exception as e:
+            print(f" Could not cache response: {e}")
+
+    def _timeout(self, timeout: Optional[float]):
+        return (CONNECT_TIMEOUT, timeout if timeout is not None else self.timeout)
+
+    def _request(self, method: str, url: str, retries: Optional[int] = None,
+                 **kwargs) -> requests.Response:
+        """Send a request, retrying transient failures with backoff"""
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            last = attempt == retries
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                # ConnectTimeout is a ConnectionError; read timeouts are not retried
+                if last:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or last:
+                    return response
+                response.close()
+
+            with self._lock:
+                self._stats['retries'] += 1
+            time.sleep(self.backoff * (2 ** attempt))
+
+    def get(self, path: str, timeout: float = CONNECT_TIMEOUT) -> requests.Response:
+        """GET an API path such as /api/tags (not retried, health checks should fail fast)"""
+        return self._request("GET", f"{self.base_url}{path}", retries=0, timeout=timeout)
+
+    def is_available(self, timeout: float = 3) -> bool:
+        try:
+            return self.get("/api/tags", timeout=timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict] = None,
+                 timeout: Optional[float] = None, source: str = "ollama",
+                 cache: Optional[bool] = None) -> requests.Response:
+        """
+        Non-streaming /api/generate call. The response is returned as is
+        so callers keep their own status handling; requests exceptions
+        propagate once retries are exhausted. Cache hits come back as a
+        synthetic 200 response with the stored body.
+        """
+        start = time.time()
+        cache = self._wants_cache(cache, options)
+        key = response_key(model, prompt, options)
+        cached = self._cached(key, cache)
+        if cached is not None:
+            self._record(source, model, time.time() - start, True, cached=True)
+            return _cached_response(self.generate_url, cached)
+
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "options": options or {}
+        }
+
+        try:
+            response = self._request("POST", self.generate_url, json=payload,
+                                     timeout=self._timeout(timeout))
+        except Exception:
+            self._record(source, model, time.time() - start, ok=False)
+            raise
+
+        data = {}
+        if response.status_code == 200:
+            try:
+                data = response.json()
+            except ValueError:
+                pass
+        latency = time.time() - start
+        self._record(source, model, latency, response.status_code == 200,
+                     data.get("prompt_eval_count", 0), data.get("eval_count", 0))
+        self._store(key, model, data, latency, cache)
+        return response
+
+    def stream(self, model: str, prompt: str, options: Optional[Dict] = None,
+               timeout: Optional[float] = None, source: str = "ollama",
+               cache: Optional[bool] = None) -> Iterator[str]:
+        """
+        Yield response text as it is generated ("stream": true).
+        Time to first token is logged to the agent tracker under `source`.
+        Raises requests exceptions / OllamaError like a non-streaming call.
+        Shares cache entries with generate(); a hit is yielded in one piece.
+        """
+        start = time.time()
+        cache = self._wants_cache(cache, options)
+        key = response_key(model, prompt, options)
+        cached = self._cached(key, cache)
+        if cached is not None:
+            self._record(source, model, time.time() - start, True, cached=True)
+            yield cached.get("response", "")
+            return
+
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options or {}
+        }
+
+        first_token = True
+        ok = False
+        counts = {}
+        text = []
+
+        try:
+            response = self._request("POST", self.generate_url, json=payload, stream=True,
+                                     timeout=self._timeout(timeout))
+            with response:
+                if response.status_code != 200:
+                    raise OllamaError(f"Ollama returned status {response.status_code}: {response.text[:200]}")
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise OllamaError(data["error"])
+
+                    token = data.get("response", "")
+                    if token:
+                        if first_token:
+                            _track_first_token(source, time.time() - start)
+                            first_token = False
+                        text.append(token)
+                        yield token
+
+                    if data.get("done"):
+                        counts = data
+                        break
+            ok = True
+        finally:
+            latency = time.time() - start
+            self._record(source, model, latency, ok,
+                         counts.get("prompt_eval_count", 0), counts.get("eval_count", 0))
+
+        if counts:
+            self._store(key, model, {**counts, "response": "".join(text)}, latency, cache)
+
+    def _record(self, source: str, model: str, latency: float, ok: bool,
+                prompt_tokens: int = 0, completion_tokens: int = 0, cached: bool = False):
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['cache_hits'] += 1 if cached else 0
+            self._stats['errors'] += 0 if ok else 1
+            self._stats['seconds'] += latency
+            self._stats['prompt_tokens'] += prompt_tokens
+            self._stats['completion_tokens'] += completion_tokens
+
+        try:
+            from tracker_integration import get_tracker
+            get_tracker().log_action("ollama_call", source=source, model=model, ok=ok,
+                                     cached=cached, latency=round(latency, 3),
+                                     prompt_tokens=prompt_tokens,
+                                     completion_tokens=completion_tokens)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict:
+        """Call counts, total latency and token usage since start"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_latency'] = stats['seconds'] / stats['calls'] if stats['calls'] else 0.0
+        stats['cache_hit_rate'] = stats['cache_hits'] / stats['calls'] if stats['calls'] else 0.0
+        return stats
+
+
+def _cached_response(url: str, data: Dict) -> requests.Response:
+    """requests.Response carrying a cached JSON body"""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    response._content = json.dumps(data).encode("utf-8")
+    return response
+
+
+def _track_first_token(source: str, ttft: float):
+    print(f" First token after {ttft:.2f}s ({source})")
+    try:
+        from tracker_integration import get_tracker
+        get_tracker().log_action("first_token", source=source, ttft=round(ttft, 3))
+    except Exception:
+        pass
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+
+def get_ollama_client() -> OllamaClient:
+    """Process-wide Ollama client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+def stream_generate(model: str, prompt: str, options: Optional[Dict] = None,
+                    timeout: Optional[float] = None, source: str = "ollama") -> Iterator[str]:
+    """Stream a generation through the shared client"""
+    return get_ollama_client().stream(model, prompt, options, timeout, source)
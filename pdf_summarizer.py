@@ -0,0 +1,365 @@
+# pdf_summarizer.py - Concurrent map / tree-reduce summarization of long documents
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from chunk_service import split_text
+from context_packer import estimate_tokens
+from extractive import select_sentences
+from main import research_topic
+from hashing import content_hash
+from summary_store import SummaryStore, get_summary_store, job_key
+from tracker_integration import get_tracker
+
+
+# Map calls in flight; match the server's OLLAMA_NUM_PARALLEL so it stays busy
+DEFAULT_WORKERS = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+SECTION_PROMPT = "Summarize this section of a research paper:\n\n{text}"
+COMBINE_PROMPT = "Combine the following section summaries into one cohesive academic summary:\n\n{text}"
+
+# Summary tokens per combine call; keeps prompt + answer inside the model context
+REDUCE_TOKEN_BUDGET = 1500
+
+
+def llm_summarize(prompt: str) -> str:
+    """One LLM summarization call (LLM-only research, no paper fetching)"""
+    return research_topic(prompt, skip_tools=True)
+
+
+def is_failed(summary: Optional[str]) -> bool:
+    """research_topic reports failures as 'Error: ...' text instead of raising"""
+    return not summary or not summary.strip() or summary.startswith("Error")
+
+
+@dataclass
+class SummaryResult:
+    """Output of summarize_document()"""
+    summary: str
+    section_summaries: List[Optional[str]]
+    failed: List[int] = field(default_factory=list)
+    map_seconds: float = 0.0
+    reduce_seconds: float = 0.0
+    reduce_levels: int = 0
+    workers: int = 1
+    resumed_sections: int = 0
+    from_store: bool = False
+    tokens_before: int = 0
+    tokens_to_llm: int = 0
+    selection_seconds: float = 0.0
+
+    @property
+    def token_reduction(self) -> float:
+        """Fraction of document tokens kept out of the map step by pre-selection"""
+        return 1 - self.tokens_to_llm / self.tokens_before if self.tokens_before else 0.0
+
+    @property
+    def seconds(self) -> float:
+        return self.selection_seconds + self.map_seconds + self.reduce_seconds
+
+
+def split_sections(text: str, chunk_size: int = 1500, chunk_overlap: int = 100) -> List[str]:
+    """Split a document into sections small enough for one map call"""
+    return split_text(text, chunk_size, chunk_overlap).texts()
+
+
+def _script_context():
+    """Streamlit script context of the calling thread (None outside Streamlit)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+
+
+def _attach_context(ctx):
+    """Let worker threads see the session (tracker) of the script that started them"""
+    if ctx is not None:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+
+class _Pool(ThreadPoolExecutor):
+    """Thread pool that remembers its futures so queued ones can be cancelled"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = super().submit(fn, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+
+@contextmanager
+def _executor(workers: int):
+    """
+    Bounded thread pool. If the caller is interrupted (e.g. a Streamlit
+    rerun) queued calls are cancelled instead of waited for; calls already
+    running finish in the background.
+    """
+    pool = _Pool(max_workers=max(1, workers), initializer=_attach_context,
+                 initargs=(_script_context(),))
+    try:
+        yield pool
+    except BaseException:
+        # shutdown(cancel_futures=True) needs Python 3.9
+        for future in pool.futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+        raise
+    pool.shutdown()
+
+
+def _call(summarize_fn: Callable[[str], str], prompt: str, i: int,
+          on_done: Optional[Callable[[int, str], None]]) -> str:
+    summary = summarize_fn(prompt)
+    if on_done and not is_failed(summary):
+        on_done(i, summary)
+    return summary
+
+
+def _run_prompts(pool: ThreadPoolExecutor, prompts: List[str],
+                 summarize_fn: Callable[[str], str],
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 on_done: Optional[Callable[[int, str], None]] = None
+                 ) -> Tuple[List[Optional[str]], List[int]]:
+    """
+    Run prompts on the pool; failed ones are None and listed by index.
+    on_done(index, summary) runs in the worker thread for each success.
+    """
+    results: List[Optional[str]] = [None] * len(prompts)
+    failed: List[int] = []
+
+    futures = {pool.submit(_call, summarize_fn, prompt, i, on_done): i
+               for i, prompt in enumerate(prompts)}
+    for done, future in enumerate(as_completed(futures), 1):
+        i = futures[future]
+        try:
+            summary = future.result()
+        except Exception as e:
+            print(f" Summary call {i + 1} failed: {e}")
+            summary = None
+
+        if is_failed(summary):
+            failed.append(i)
+        else:
+            results[i] = summary
+
+        if progress:
+            progress(done, len(prompts))
+
+    return results, sorted(failed)
+
+
+def summarize_sections(sections: List[str],
+                       summarize_fn: Callable[[str], str] = llm_summarize,
+                       workers: int = DEFAULT_WORKERS,
+                       progress: Optional[Callable[[int, int], None]] = None
+                       ) -> Tuple[List[Optional[str]], List[int]]:
+    """
+    Map step: summarize every section with at most `workers` calls in
+    flight. A failing section does not stop the others; its slot is None
+    and its index is returned in the failed list. progress(done, total)
+    is called from the calling thread as sections finish.
+    """
+    if not sections:
+        return [], []
+
+    with _executor(workers) as pool:
+        return _run_prompts(pool, [SECTION_PROMPT.format(text=s) for s in sections],
+                            summarize_fn, progress)
+
+
+def group_by_budget(summaries: List[str], token_budget: int = REDUCE_TOKEN_BUDGET) -> List[List[str]]:
+    """
+    Split consecutive summaries into groups of at most token_budget tokens.
+    Groups take at least two summaries (when available) even if that goes
+    over budget, so every reduce level at least halves the count.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if current and len(current) >= 2 and used + tokens > token_budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(summary)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def tree_reduce(summaries: List[str],
+                summarize_fn: Callable[[str], str] = llm_summarize,
+                workers: int = DEFAULT_WORKERS,
+                token_budget: int = REDUCE_TOKEN_BUDGET,
+                pool: Optional[ThreadPoolExecutor] = None) -> Tuple[str, int]:
+    """
+    Reduce step: combine summaries in budget-sized groups, all groups of a
+    level concurrently, until one summary is left. Latency grows with the
+    number of levels (log of the section count), not with prompt length.
+    A group whose combine call fails is passed on as its joined inputs.
+    Returns (summary, number of levels).
+    """
+    if not summaries:
+        return "", 0
+    if pool is None:
+        with _executor(workers) as pool:
+            return tree_reduce(summaries, summarize_fn, workers, token_budget, pool)
+
+    levels = 0
+    while len(summaries) > 1:
+        groups = group_by_budget(summaries, token_budget)
+        combine = [i for i, group in enumerate(groups) if len(group) > 1]
+        results, failed = _run_prompts(
+            pool, [COMBINE_PROMPT.format(text="\n\n".join(groups[i])) for i in combine], summarize_fn
+        )
+
+        levels += 1
+        print(f" Reduce level {levels}: {len(summaries)} summaries -> {len(groups)} "
+              f"({len(failed)} combine calls failed)")
+
+        combined = dict(zip(combine, results))
+        summaries = [
+            combined[i] if combined.get(i) is not None else "\n\n".join(group)
+            for i, group in enumerate(groups)
+        ]
+
+    return summaries[0], levels
+
+
+def summarize_document(text: str, chunk_size: int = 1500, chunk_overlap: int = 100,
+                       workers: int = DEFAULT_WORKERS,
+                       summarize_fn: Callable[[str], str] = llm_summarize,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       token_budget: int = REDUCE_TOKEN_BUDGET,
+                       doc_hash: Optional[str] = None,
+                       store: Optional[SummaryStore] = None,
+                       resume: bool = True,
+                       extract_fraction: Optional[float] = None) -> SummaryResult:
+    """
+    Summarize a long document: split into sections, summarize them
+    concurrently, then tree-reduce the section summaries (see tree_reduce).
+
+    Section summaries are checkpointed in the summary store under the
+    content hash of each section as they complete, so a repeated run only
+    summarizes the missing sections. A fully summarized document (looked
+    up by doc_hash, default: hash of text) is returned straight from the
+    store, before any sentence selection or splitting. resume=False
+    starts over.
+
+    extract_fraction (e.g. 0.4) first keeps only the most central /
+    best placed sentences covering that share of the text (see
+    extractive.select_sentences), trading coverage for fewer map calls.
+    Raises RuntimeError if no section could be summarized.
+    """
+    tracker = get_tracker()
+    store = store if store is not None else get_summary_store()
+    job = job_key(doc_hash or content_hash(text), chunk_size, chunk_overlap, extract_fraction)
+    tokens_before = estimate_tokens(text)
+
+    stored = store.get_summary(job) if resume else None
+    if stored is not None:
+        summary, keys = stored
+        sections = store.get_sections(keys)
+        summaries = [sections[key] for key in keys if key in sections]
+        print(f" Summary of {len(keys)} sections loaded from store")
+        tracker.log_action("summarize_document", sections=len(keys), from_store=True)
+        if progress:
+            progress(len(keys), len(keys))
+        return SummaryResult(summary=summary, section_summaries=summaries, workers=workers,
+                             resumed_sections=len(keys), from_store=True,
+                             tokens_before=tokens_before, tokens_to_llm=0)
+
+    selection_seconds = 0.0
+    if extract_fraction and extract_fraction < 1:
+        selection = select_sentences(text, extract_fraction)
+        text = selection.text
+        selection_seconds = selection.seconds
+        print(f" Pre-selected {selection.sentences_kept}/{selection.sentences_total} sentences: "
+              f"{selection.tokens_before} -> {selection.tokens_after} tokens "
+              f"({selection.token_reduction:.0%} less) in {selection.seconds:.2f}s")
+    tokens_to_llm = estimate_tokens(text)
+
+    sections = split_sections(text, chunk_size, chunk_overlap)
+    keys = [content_hash(section) for section in sections]
+    if not resume:
+        store.forget(job, keys)
+
+    summaries: List[Optional[str]] = [None] * len(sections)
+    checkpoints = store.get_sections(keys)
+    for i, key in enumerate(keys):
+        summaries[i] = checkpoints.get(key)
+    todo = [i for i, summary in enumerate(summaries) if summary is None]
+    resumed = len(sections) - len(todo)
+    if resumed:
+        print(f" Resuming: {resumed} of {len(sections)} sections already summarized")
+
+    def report(done, total):
+        if progress:
+            progress(resumed + done, len(sections))
+
+    def checkpoint(j, summary):
+        store.put_section(keys[todo[j]], summary)
+
+    with _executor(workers) as pool:
+        start = time.time()
+        results, failed_todo = _run_prompts(
+            pool, [SECTION_PROMPT.format(text=sections[i]) for i in todo],
+            summarize_fn, report, checkpoint
+        )
+        map_seconds = time.time() - start
+
+        for i, summary in zip(todo, results):
+            summaries[i] = summary
+        failed = [todo[j] for j in failed_todo]
+
+        done = [s for s in summaries if s is not None]
+        if not done:
+            raise RuntimeError(f"None of the {len(sections)} sections could be summarized")
+
+        start = time.time()
+        summary, levels = tree_reduce(done, summarize_fn, workers, token_budget, pool)
+        reduce_seconds = time.time() - start
+
+    # Only complete jobs are final; failed sections are retried next time
+    if not failed:
+        store.put_summary(job, summary, keys)
+
+    print(f" Summarized {len(todo)} sections in {map_seconds:.1f}s "
+          f"({workers} workers, {len(failed)} failed, {resumed} resumed), "
+          f"reduced in {levels} levels / {reduce_seconds:.1f}s")
+    tracker.log_action("summarize_document",
+                       sections=len(sections),
+                       resumed=resumed,
+                       failed=len(failed),
+                       workers=workers,
+                       reduce_levels=levels,
+                       tokens_before=tokens_before,
+                       tokens_to_llm=tokens_to_llm,
+                       selection_seconds=round(selection_seconds, 2),
+                       map_seconds=round(map_seconds, 2),
+                       reduce_seconds=round(reduce_seconds, 2))
+
+    return SummaryResult(
+        summary=summary,
+        section_summaries=summaries,
+        failed=failed,
+        map_seconds=map_seconds,
+        reduce_seconds=reduce_seconds,
+        reduce_levels=levels,
+        workers=workers,
+        resumed_sections=resumed,
+        tokens_before=tokens_before,
+        tokens_to_llm=tokens_to_llm,
+        selection_seconds=selection_seconds
+    )
@@ -1,39 +1,168 @@
 import PyPDF2
+import io
+import multiprocessing
+import os
 import re
 import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
 from tracker_integration import get_tracker, get_calc
 
 
+# Extraction processes. Page-parallel extraction is opt-in: no speedup over
+# serial has been measured yet (worker start-up dominated on the test box)
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+
+# With workers > 1, files with fewer pages are still extracted in this process
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+
+# Pages per task sent to an extraction worker
+PAGES_PER_TASK = 8
+
+
+# Two or more single letters/digits separated by single spaces ("G e e k s")
+_SPACED_RUN = re.compile(r"(?<![A-Za-z0-9])[A-Za-z0-9](?: [A-Za-z0-9])+(?![A-Za-z0-9])")
+_SPACES = re.compile(r" {2,}")
+
+# Share of a line's visible characters in spaced runs from which the line is letter-spaced
+SPACED_LINE_SHARE = 0.5
+
+# Outside letter-spaced lines, only runs this long are collapsed ("A B S T R A C T")
+MIN_INLINE_RUN = 5
+
+
+def _collapse_run(match) -> str:
+    return match.group().replace(" ", "")
+
+
+def _collapse_long_run(match) -> str:
+    run = match.group()
+    return run.replace(" ", "") if len(run) >= 2 * MIN_INLINE_RUN - 1 else run
+
+
+def _clean_line(line: str) -> str:
+    """Collapse letter-spaced runs in one line, then runs of spaces"""
+    runs = _SPACED_RUN.findall(line)
+    if runs:
+        spaced = sum((len(run) + 1) // 2 for run in runs)
+        visible = len(line) - line.count(" ")
+        collapse = _collapse_run if spaced >= SPACED_LINE_SHARE * visible else _collapse_long_run
+        line = _SPACED_RUN.sub(collapse, line)
+    return _SPACES.sub(" ", line) if "  " in line else line
+
+
 def clean_extracted_text(text: str) -> str:
     """
     Smart cleaning for PDFs with character spacing.
+    Works line by line in a single pass: letter-spaced runs are joined
+    ("G e e k s" -> "Geeks") where most of the line is letter-spaced, or
+    when a run is long enough to be a spaced-out word in normal text;
+    word gaps (runs of spaces) become one space and more than one blank
+    line becomes one. Normal words are never joined.
+    """
+    lines = []
+    blank = 0
+    for line in text.split("\n"):
+        if not line:
+            blank += 1
+            if blank > 1:
+                continue
+        else:
+            blank = 0
+        lines.append(_clean_line(line) if " " in line else line)
+    
+    return "\n".join(lines).strip()
+
+
+def _read_source(pdf_file):
+    """A path, or the bytes of a file-like object, that every worker can open"""
+    if isinstance(pdf_file, str):
+        return pdf_file
+    if hasattr(pdf_file, 'seek'):
+        pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def _open_pdf(source, method: str):
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if method == "pdfplumber":
+        import pdfplumber
+        return pdfplumber.open(source)
+    return PyPDF2.PdfReader(source)
+
+
+def _extract_pages(pdf, start: int, end: int) -> Tuple[List[str], List[str], float]:
+    """Raw and cleaned text of pages [start, end), and the time spent cleaning"""
+    raw_pages, cleaned_pages = [], []
+    clean_seconds = 0.0
+    for page in pdf.pages[start:end]:
+        raw = page.extract_text() or ""
+        clean_start = time.time()
+        cleaned_pages.append(clean_extracted_text(raw) if raw else "")
+        clean_seconds += time.time() - clean_start
+        raw_pages.append(raw)
+    return raw_pages, cleaned_pages, clean_seconds
+
+
+# Document opened once by each extraction worker (see _init_worker)
+_worker_pdf = None
+
+
+def _init_worker(source, method: str):
+    global _worker_pdf
+    _worker_pdf = _open_pdf(source, method)
+
+
+def _extract_range(start: int, end: int) -> Tuple[List[str], List[str], float]:
+    return _extract_pages(_worker_pdf, start, end)
+
+
+def extract_pages(source, pdf, method: str = "pypdf2",
+                  workers: int = None) -> Tuple[List[str], List[str], float, int]:
+    """
+    Extract and clean every page of an opened pdf. With workers > 1
+    (default EXTRACT_WORKERS), files with at least PARALLEL_MIN_PAGES
+    pages are split into ranges of PAGES_PER_TASK pages
+    across worker processes; each worker opens the file (source) once and
+    cleans the pages it extracts. Pages come back in document order.
+    
+    Returns: (raw pages, cleaned pages, cleaning seconds summed over pages, workers used)
     """
+    if workers is None:
+        workers = EXTRACT_WORKERS
     
-    # Step 1: Fix character spacing aggressively
-    for _ in range(15):
-        text = re.sub(r'([A-Za-z0-9]) ([A-Za-z0-9])', r'\1\2', text)
+    num_pages = len(pdf.pages)
+    if workers <= 1 or num_pages < PARALLEL_MIN_PAGES:
+        return (*_extract_pages(pdf, 0, num_pages), 1)
     
-    # Step 2: Add spaces back where needed
-    text = re.sub(r'\.([A-Z])', r'. \1', text)
-    text = re.sub(r',([A-Za-z])', r', \1', text)
-    text = re.sub(r'([A-Za-z])\(', r'\1 (', text)
-    text = re.sub(r'\)([A-Za-z])', r') \1', text)
-    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+    ranges = [(start, min(start + PAGES_PER_TASK, num_pages))
+              for start in range(0, num_pages, PAGES_PER_TASK)]
+    workers = min(workers, len(ranges))
     
-    # Clean up excessive whitespace
-    text = re.sub(r' {2,}', ' ', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    raw_pages, cleaned_pages = [], []
+    clean_seconds = 0.0
+    # spawn, as in AdvancedRAG.add_documents: the app process may hold a torch model
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(source, method)) as pool:
+        for raw, cleaned, seconds in pool.map(_extract_range, *zip(*ranges)):
+            raw_pages.extend(raw)
+            cleaned_pages.extend(cleaned)
+            clean_seconds += seconds
     
-    return text.strip()
+    return raw_pages, cleaned_pages, clean_seconds, workers
 
 
-def extract_text_from_pdf(pdf_file, track: bool = True) -> str:
+def extract_text_from_pdf(pdf_file, track: bool = True, workers: int = None) -> str:
     """
     Extract text from PDF with aggressive cleaning and agent tracking.
+    With workers > 1, large files are extracted page-parallel on a process pool (see extract_pages).
     
     Args:
         pdf_file: File path or file-like object
         track: Whether to log actions and rewards (default: True)
+        workers: Extraction processes (default: PDF_EXTRACT_WORKERS, 1 = serial)
     
     Returns:
         Cleaned text content
@@ -58,10 +187,8 @@ def extract_text_from_pdf(pdf_file, track: bool = True) -> str:
     
     try:
         # Handle both file path and file-like object
-        if isinstance(pdf_file, str):
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-        else:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+        source = _read_source(pdf_file)
+        pdf_reader = _open_pdf(source, "pypdf2")
         
         num_pages = len(pdf_reader.pages)
         
@@ -70,15 +197,15 @@ def extract_text_from_pdf(pdf_file, track: bool = True) -> str:
                               num_pages=num_pages,
                               filename=filename)
         
-        text = ""
-        for page_num, page in enumerate(pdf_reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
+        # Pages are cleaned as they are extracted
+        raw_pages, cleaned_pages, clean_duration, used_workers = extract_pages(
+            source, pdf_reader, "pypdf2", workers)
+        text = "".join(page + "\n" for page in raw_pages if page)
         
         extraction_duration = time.time() - start_time
         
-        print(f" Raw extraction: {len(text)} chars from {num_pages} pages")
+        print(f" Raw extraction: {len(text)} chars from {num_pages} pages"
+              f"{f' ({used_workers} workers)' if used_workers > 1 else ''}")
         
         if not text.strip():
             if track:
@@ -94,13 +221,11 @@ def extract_text_from_pdf(pdf_file, track: bool = True) -> str:
                              f"Extraction time: {extraction_duration:.2f}s")
         
         # Apply aggressive cleaning
-        clean_start = time.time()
         if track:
             tracker.log_action("clean_text", 
                               original_length=len(text))
         
-        cleaned_text = clean_extracted_text(text)
-        clean_duration = time.time() - clean_start
+        cleaned_text = "\n".join(page for page in cleaned_pages if page).strip()
         
         print(f" After cleaning: {len(cleaned_text)} chars")
         
@@ -143,9 +268,10 @@ def extract_text_from_pdf(pdf_file, track: bool = True) -> str:
         raise
 
 
-def extract_text_with_pdfplumber(pdf_file, track: bool = True):
+def extract_text_with_pdfplumber(pdf_file, track: bool = True, workers: int = None):
     """
     Alternative extraction using pdfplumber with tracking.
+    workers > 1 extracts large files page-parallel, as in extract_text_from_pdf.
     """
     tracker = get_tracker()
     calc = get_calc()
@@ -155,26 +281,19 @@ def extract_text_with_pdfplumber(pdf_file, track: bool = True):
                           method="pdfplumber")
     
     try:
-        import pdfplumber
-        
         start = time.time()
         
-        if isinstance(pdf_file, str):
-            pdf = pdfplumber.open(pdf_file)
-        else:
-            pdf = pdfplumber.open(pdf_file)
-        
-        text = ""
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        
-        pdf.close()
+        source = _read_source(pdf_file)
+        pdf = _open_pdf(source, "pdfplumber")  # ImportError without pdfplumber
+        try:
+            raw_pages, cleaned_pages, _, used_workers = extract_pages(source, pdf, "pdfplumber", workers)
+        finally:
+            pdf.close()
         
         duration = time.time() - start
         
-        print(f" PDFPlumber extracted: {len(text)} chars")
+        print(f" PDFPlumber extracted: {sum(len(page) + 1 for page in raw_pages if page)} chars"
+              f"{f' ({used_workers} workers)' if used_workers > 1 else ''}")
         
         if track:
             tracker.add_reward(calc.task_completion(True), 
@@ -182,7 +301,7 @@ def extract_text_with_pdfplumber(pdf_file, track: bool = True):
             tracker.add_reward(calc.response_time(duration, 5.0),
                              f"Time: {duration:.2f}s")
         
-        return clean_extracted_text(text)
+        return "\n".join(page for page in cleaned_pages if page).strip()
         
     except ImportError:
         print(" pdfplumber not installed. Using PyPDF2 instead.")
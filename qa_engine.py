@@ -2,12 +2,16 @@
 import streamlit as st
 import requests
 import time
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import Iterator, Union
 from tracker_integration import get_tracker, get_calc
+from embedding_cache import get_embedding_cache
+from hierarchical_index import get_hierarchical_index
+from ollama_client import get_ollama_client
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+ANSWER_OPTIONS = {"temperature": 0.3, "num_predict": 500}
+
+# Overlap of the parent windows retrieved as context
+PARENT_OVERLAP = 200
 
 
 def make_qa_chain(pdf_text: str, chunk_size: int = 2000, k: int = 3, 
@@ -15,6 +19,9 @@ def make_qa_chain(pdf_text: str, chunk_size: int = 2000, k: int = 3,
     """
     Offline Q&A system with agent tracking.
     Returns a callable function that answers questions.
+    Context windows of chunk_size are retrieved from the document's
+    hierarchical index, which the Semantic Search tab shares, so only
+    the first of the two tabs embeds the document.
     """
     tracker = get_tracker()
     calc = get_calc()
@@ -27,30 +34,22 @@ def make_qa_chain(pdf_text: str, chunk_size: int = 2000, k: int = 3,
                           text_length=len(pdf_text))
     
     try:
-        #  Create vector embeddings
-        embed = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-        
-        #  Split text into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        texts = text_splitter.split_text(pdf_text)
-        
-        if not texts:
-            raise ValueError("No text chunks created from PDF")
+        #  Embed small chunks once, score chunk_size windows from them
+        index = get_hierarchical_index(pdf_text)
+        windows, _ = index.parents(chunk_size, PARENT_OVERLAP)
         
-        # Create FAISS index
-        vectordb = FAISS.from_texts(texts, embed)
-        retriever = vectordb.as_retriever(search_kwargs={"k": k})
+        if not len(index) or not len(windows):
+            raise ValueError("No text chunks created from PDF")
         
         duration = time.time() - start
-        print(f" QA Index created with {len(texts)} chunks in {duration:.2f}s")
+        cache_stats = get_embedding_cache().stats()
+        print(f" QA Index ready with {len(windows)} windows over {len(index)} chunks in {duration:.2f}s "
+              f"(embedding cache hit rate {cache_stats['hit_rate']:.0%})")
         
         if track:
+            tracker.log_action("embedding_cache", **cache_stats)
             tracker.add_reward(calc.task_completion(True),
-                             f"QA index built ({len(texts)} chunks)")
+                             f"QA index built ({len(windows)} chunks)")
             tracker.add_reward(calc.response_time(duration, 10.0),
                              f"Build time: {duration:.2f}s")
             tracker.add_reward(3, f"Retrieval depth: {k} documents")
@@ -61,39 +60,28 @@ def make_qa_chain(pdf_text: str, chunk_size: int = 2000, k: int = 3,
             tracker.add_reward(calc.error_penalty(),
                              f"QA index build failed: {str(e)}")
         raise
+    
+    ollama = get_ollama_client()
 
-    def answer(question: str, track_answer: bool = True) -> str:
-        """Answer questions based on the PDF content"""
+    def retrieve_prompt(question: str, track_answer: bool):
+        """Retrieve context and build the prompt, (prompt, None) or (None, message)"""
         tracker = get_tracker()
-        calc = get_calc()
         
-        start = time.time()
-        if track_answer:
-            tracker.log_action("answer_question",
-                              question=question[:50],
-                              k=k)
+        # Retrieve most relevant context
+        docs = index.search_parents(question, k, chunk_size, PARENT_OVERLAP)
         
-        try:
-            # Retrieve most relevant context
-            try:
-                docs = retriever.invoke(question)
-            except AttributeError:
-                docs = retriever.get_relevant_documents(question)
-            
-            retrieval_duration = time.time() - start
-            
-            if not docs:
-                if track_answer:
-                    tracker.add_reward(-2, "No relevant context found")
-                return "⚠️ No relevant context found in the document."
-            
+        if not docs:
             if track_answer:
-                tracker.add_reward(2, f"Retrieved {len(docs)} context chunks")
-            
-            context = "\n\n---\n\n".join([doc.page_content for doc in docs])
-            
-            # Build prompt
-            prompt = f"""You are Athena, an intelligent AI research assistant.
+                tracker.add_reward(-2, "No relevant context found")
+            return None, "⚠️ No relevant context found in the document."
+        
+        if track_answer:
+            tracker.add_reward(2, f"Retrieved {len(docs)} context chunks")
+        
+        context = "\n\n---\n\n".join([text for text, _ in docs])
+        
+        # Build prompt
+        prompt = f"""You are Athena, an intelligent AI research assistant.
 Answer the question based strictly on the provided context below.
 If the context doesn't contain enough information, say: "I don't have enough information from this document to answer that question."
 
@@ -103,27 +91,99 @@ Context:
 Question: {question}
 
 Answer:"""
+        
+        # LOG ACTION: Call LLM
+        if track_answer:
+            tracker.log_action("call_ollama_qa",
+                              model=model,
+                              prompt_length=len(prompt))
+        return prompt, None
+    
+    def reward_answer(answer_text: str, total_duration: float):
+        tracker = get_tracker()
+        calc = get_calc()
+        
+        tracker.add_reward(calc.task_completion(True),
+                         "Answer generated successfully")
+        tracker.add_reward(calc.response_time(total_duration, 15.0),
+                         f"Total time: {total_duration:.2f}s")
+        
+        # Quality based on answer length
+        if len(answer_text) > 100:
+            tracker.add_reward(5, "Detailed answer")
+        elif len(answer_text) > 50:
+            tracker.add_reward(3, "Good answer")
+        else:
+            tracker.add_reward(1, "Brief answer")
+    
+    def error_message(e: Exception, track_answer: bool) -> str:
+        tracker = get_tracker()
+        calc = get_calc()
+        
+        if isinstance(e, requests.exceptions.Timeout):
+            if track_answer:
+                tracker.add_reward(calc.error_penalty(), "Request timeout")
+            return "❌ Request timed out. The model might be processing a large context."
+        if isinstance(e, requests.exceptions.ConnectionError):
+            if track_answer:
+                tracker.add_reward(calc.error_penalty(), "Connection error")
+            return "❌ Could not connect to Ollama. Make sure it's running."
+        if track_answer:
+            tracker.add_reward(calc.error_penalty(), f"QA error: {str(e)}")
+        return f"❌ Error during Q&A: {str(e)}"
+    
+    def answer_stream(question: str, track_answer: bool) -> Iterator[str]:
+        """Yield the answer as it is generated; rewards are given once it completes"""
+        start = time.time()
+        answer_text = ""
+        
+        try:
+            prompt, message = retrieve_prompt(question, track_answer)
+            if message:
+                yield message
+                return
             
-            # LOG ACTION: Call LLM
-            llm_start = time.time()
+            for token in ollama.stream(model, prompt, ANSWER_OPTIONS, source="qa_answer"):
+                answer_text += token
+                yield token
+        except Exception as e:
+            yield ("\n\n" if answer_text else "") + error_message(e, track_answer)
+            return
+        
+        if not answer_text.strip():
             if track_answer:
-                tracker.log_action("call_ollama_qa",
-                                  model=model,
-                                  prompt_length=len(prompt))
+                get_tracker().add_reward(-3, "Empty answer from LLM")
+            yield " No answer received from the model."
+        elif track_answer:
+            reward_answer(answer_text, time.time() - start)
+    
+    def answer(question: str, track_answer: bool = True,
+               stream: bool = False) -> Union[str, Iterator[str]]:
+        """
+        Answer questions based on the PDF content.
+        With stream=True a generator yielding the answer text is returned.
+        """
+        tracker = get_tracker()
+        calc = get_calc()
+        
+        if track_answer:
+            tracker.log_action("answer_question",
+                              question=question[:50],
+                              k=k,
+                              stream=stream)
+        
+        if stream:
+            return answer_stream(question, track_answer)
+        
+        start = time.time()
+        try:
+            prompt, message = retrieve_prompt(question, track_answer)
+            if message:
+                return message
             
             # Send request to Ollama API
-            payload = {
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "num_predict": 500
-                }
-            }
-            
-            response = requests.post(OLLAMA_URL, json=payload, timeout=120)
-            llm_duration = time.time() - llm_start
+            response = ollama.generate(model, prompt, ANSWER_OPTIONS,
+                                       timeout=120, source="qa_answer")
             
             if response.status_code != 200:
                 if track_answer:
@@ -139,36 +199,13 @@ Answer:"""
                     tracker.add_reward(-3, "Empty answer from LLM")
                 return " No answer received from the model."
             
-            total_duration = time.time() - start
-            
             # REWARDS
             if track_answer:
-                tracker.add_reward(calc.task_completion(True),
-                                 "Answer generated successfully")
-                tracker.add_reward(calc.response_time(total_duration, 15.0),
-                                 f"Total time: {total_duration:.2f}s")
-                
-                # Quality based on answer length
-                if len(answer_text) > 100:
-                    tracker.add_reward(5, "Detailed answer")
-                elif len(answer_text) > 50:
-                    tracker.add_reward(3, "Good answer")
-                else:
-                    tracker.add_reward(1, "Brief answer")
+                reward_answer(answer_text, time.time() - start)
             
             return answer_text
             
-        except requests.exceptions.Timeout:
-            if track_answer:
-                tracker.add_reward(calc.error_penalty(), "Request timeout")
-            return "❌ Request timed out. The model might be processing a large context."
-        except requests.exceptions.ConnectionError:
-            if track_answer:
-                tracker.add_reward(calc.error_penalty(), "Connection error")
-            return "❌ Could not connect to Ollama. Make sure it's running."
         except Exception as e:
-            if track_answer:
-                tracker.add_reward(calc.error_penalty(), f"QA error: {str(e)}")
-            return f"❌ Error during Q&A: {str(e)}"
+            return error_message(e, track_answer)
     
-    return answer
\ No newline at end of file
+    return answer
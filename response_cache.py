@@ -0,0 +1,97 @@
+# response_cache.py - Disk-backed cache for LLM responses
+
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from hashing import content_hash
+from sqlite_store import SQLiteLRUStore, process_wide
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.getenv("CACHE_DIR", ".cache"), "llm_responses.sqlite")
+DEFAULT_MAX_BYTES = int(float(os.getenv("RESPONSE_CACHE_MB", "128")) * 1024 * 1024)
+DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_TTL_HOURS", "168")) * 3600
+
+
+def response_key(model: str, prompt: str, options: Optional[Dict] = None) -> str:
+    """Content address of a generation request"""
+    return content_hash(json.dumps([model, prompt, options or {}], sort_keys=True, ensure_ascii=False))
+
+
+class ResponseCache(SQLiteLRUStore):
+    """
+    Ollama generate responses keyed by hash of (model, prompt, options),
+    stored in SQLite so they survive restarts and are shared between
+    processes. Entries older than ttl seconds are treated as misses and
+    purged; least recently used entries are evicted once the cache
+    exceeds max_bytes. hits / misses are counted per process (see stats()).
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses ("
+        " key TEXT PRIMARY KEY, model TEXT NOT NULL, data TEXT NOT NULL,"
+        " seconds REAL NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)",
+    )
+    TABLE = "responses"
+    SIZE_COLUMN = "data"
+    KEY_COLUMNS = ("key",)
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: float = DEFAULT_TTL):
+        super().__init__(path, max_bytes, ttl)
+        self.seconds_saved = 0.0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached response payload, None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, seconds, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and now - row[2] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self._bytes -= len(row[0])
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            self.seconds_saved += row[1]
+
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, data: Dict, seconds: float = 0.0):
+        """Store a response payload, evicting old entries if over budget"""
+        blob = json.dumps(data, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute(
+                "SELECT LENGTH(data) FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, data, seconds, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, blob, seconds, now, now)
+            )
+            self._db.commit()
+            self._grew(len(blob) - (old[0] if old else 0))
+
+    def stats(self) -> Dict:
+        """Hit / miss counters, generation time saved and on-disk size"""
+        return {**super().stats(), 'seconds_saved': self.seconds_saved}
+
+
+_shared_cache = process_wide(ResponseCache)
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide LLM response cache"""
+    return _shared_cache()
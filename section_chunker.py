@@ -0,0 +1,237 @@
+# section_chunker.py - Structure-aware text splitting for research papers
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+from langchain_text_splitters import TextSplitter
+
+
+SECTION_NAMES = (
+    "abstract", "introduction", "related work", "background", "preliminaries",
+    "method", "methods", "methodology", "approach", "proposed method", "model",
+    "architecture", "experiments", "experimental setup", "experimental results",
+    "implementation", "results", "evaluation", "analysis", "discussion",
+    "limitations", "conclusion", "conclusions", "future work",
+    "acknowledgements", "acknowledgments", "references", "bibliography", "appendix"
+)
+
+_NUMBER = r"(?:\d+(?:\.\d+){0,3}\.?|[IVX]+\.|[A-H]\.)"
+
+# "3.2 Results", "IV. EXPERIMENTS", "Conclusion:"
+_SECTION_NAME = re.compile(
+    rf"^(?:{_NUMBER}\s+)?(?:{'|'.join(SECTION_NAMES)})\s*:?$", re.IGNORECASE
+)
+# "Experimental Results on ImageNet" (accepted when title-cased)
+_SECTION_PREFIX = re.compile(
+    rf"^(?:{_NUMBER}\s+)?(?:{'|'.join(SECTION_NAMES)})\b[^.!?]*$", re.IGNORECASE
+)
+# "4 Training details", "2.1. Data Collection"
+_NUMBERED_HEADING = re.compile(rf"^{_NUMBER}\s+[A-Z][^.!?]*$")
+# "Abstract—We propose ...", "Keywords: ..."
+_INLINE_HEADING = re.compile(r"^(?:abstract|keywords|index terms)\s*[—:\-–]", re.IGNORECASE)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_LINE = re.compile(r"[^\n]*\n?")
+
+# A section's last chunk smaller than this share of chunk_size carries on into the next section
+MIN_FILL = 0.75
+
+# A chunk at least this full is closed at a paragraph end instead of splitting the next paragraph
+PARAGRAPH_FILL = 0.9
+
+# Lines shorter than this share of the median line that end a sentence end a paragraph
+SHORT_LINE = 0.8
+
+# Median line length above which text is taken as unwrapped (one paragraph per line)
+WRAP_WIDTH = 200
+
+MAX_HEADING_WORDS = 8
+
+
+def _title_case(words: List[str]) -> bool:
+    long = [w for w in words if len(w) > 3 and w[0].isalpha()]
+    return not long or sum(w[0].isupper() for w in long) >= 0.75 * len(long)
+
+
+def is_heading(line: str) -> bool:
+    """
+    Section heading line: a known section name, a numbered title, or a
+    title-cased line starting with a section name. Wrapped body lines
+    ("Results show that the ...") are not headings.
+    """
+    line = line.strip()
+    words = line.split()
+    if not words or len(words) > MAX_HEADING_WORDS or line[-1] in ".,;":
+        return False
+    if _SECTION_NAME.match(line) or _NUMBERED_HEADING.match(line):
+        return True
+    return bool(_SECTION_PREFIX.match(line)) and _title_case(words)
+
+
+def _blocks(text: str) -> List[Tuple[int, int, bool]]:
+    """
+    Paragraph and heading spans as (start, end, starts_section).
+    PDF text rarely has blank lines between paragraphs, so a sentence-final
+    line noticeably shorter than the typical line also ends a paragraph.
+    """
+    lines = []
+    pos = 0
+    for match in _LINE.finditer(text):
+        if not match.group():
+            break
+        lines.append((pos, pos + len(match.group().rstrip("\n"))))
+        pos = match.end()
+
+    widths = sorted(e - s for s, e in lines if e > s)
+    typical = widths[len(widths) // 2] if widths else 0
+    wrapped = typical <= WRAP_WIDTH
+
+    blocks: List[Tuple[int, int, bool]] = []
+    start = None  # start of the open paragraph
+    starts_section = False
+    prev_end = 0
+
+    def close():
+        if start is not None:
+            blocks.append((start, prev_end, starts_section))
+
+    for s, e in lines:
+        line = text[s:e].strip()
+        if not line:
+            close()
+            start = None
+            continue
+
+        if is_heading(line):
+            close()
+            start = None
+            blocks.append((s, e, True))
+            continue
+
+        if _INLINE_HEADING.match(line):
+            close()
+            start, starts_section = s, True
+        elif start is None:
+            start, starts_section = s, False
+        prev_end = e
+
+        if not wrapped or (line[-1] in ".!?:" and (e - s) < typical * SHORT_LINE):
+            close()
+            start = None
+
+    close()
+    return blocks
+
+
+def _trim(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+class SectionChunker(TextSplitter):
+    """
+    Drop-in replacement for RecursiveCharacterTextSplitter on paper text.
+    Detects section headings (Abstract, Introduction, Method, Results,
+    numbered sections, ...) and packs whole paragraphs into chunks of up to
+    chunk_size (measured with length_function), without crossing a section
+    boundary unless the section's last chunk is under MIN_FILL full. A paragraph that does
+    not fit is split at sentence boundaries, and only when the chunk is
+    not yet PARAGRAPH_FILL full; over-long sentences are cut at words. A
+    chunk cut inside a paragraph repeats up to chunk_overlap of whole
+    trailing sentences at the start of the next one; chunks ending at a
+    paragraph or section end are not repeated. Every chunk is a contiguous
+    span of the input (see split_spans).
+    """
+
+    def __init__(self, chunk_size: int = 1500, chunk_overlap: int = 100,
+                 length_function: Callable[[str], int] = len, **kwargs):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                         length_function=length_function, **kwargs)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def _length(self, text: str, start: int, end: int) -> int:
+        return self._length_function(text[start:end])
+
+    def _sentences(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Sentence spans of a paragraph; sentences over chunk_size are cut at word boundaries"""
+        sentences = []
+        pos = start
+        for match in _SENTENCE_END.finditer(text, start, end):
+            sentences.append((pos, match.start()))
+            pos = match.end()
+        sentences.append((pos, end))
+
+        pieces = []
+        for s, e in sentences:
+            while self._length(text, s, e) > self._chunk_size:
+                cut = text.rfind(" ", s, s + self._chunk_size)
+                cut = cut if cut > s else s + self._chunk_size
+                pieces.append((s, cut))
+                s = cut + 1 if text[cut:cut + 1] == " " else cut
+            if e > s:
+                pieces.append((s, e))
+        return pieces
+
+    def _overlap_start(self, text: str, start: int, end: int) -> int:
+        """
+        Start of the trailing whole sentences of [start, end) that fit in
+        chunk_overlap (end if none do), as RecursiveCharacterTextSplitter
+        only repeats whole splits
+        """
+        if self._chunk_overlap <= 0:
+            return end
+        lo = max(start, end - self._chunk_overlap)
+        match = _SENTENCE_END.search(text, lo, end)
+        return match.end() if match else end
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Chunks as (start, end) offsets into text"""
+        # Per section: sentence units as (start, end, end of their paragraph or None)
+        sections: List[List[Tuple[int, int, Optional[int]]]] = []
+        for start, end, starts_section in _blocks(text):
+            if starts_section or not sections:
+                sections.append([])
+            start, end = _trim(text, start, end)
+            if end > start:
+                units = self._sentences(text, start, end)
+                sections[-1].append((*units[0], end))
+                sections[-1].extend((s, e, None) for s, e in units[1:])
+
+        spans: List[Tuple[int, int]] = []
+        current = None  # (start, end) of the chunk being filled
+
+        def fits(start: int, end: int) -> bool:
+            return self._length(text, start, end) <= self._chunk_size
+
+        for units in sections:
+            for s, e, paragraph_end in units:
+                if current is None:
+                    current = (s, e)
+                    continue
+
+                # A full enough chunk ends with its paragraph rather than
+                # taking only the opening sentences of the next one
+                whole_paragraph = paragraph_end is None or fits(current[0], paragraph_end)
+                if fits(current[0], e) and (
+                        whole_paragraph or self._length(text, *current) < self._chunk_size * PARAGRAPH_FILL):
+                    current = (current[0], e)
+                    continue
+
+                # Only a chunk cut mid-paragraph carries its last sentences over
+                spans.append(current)
+                overlap = e if paragraph_end is not None else self._overlap_start(text, *current)
+                current = (overlap, e) if overlap < s and fits(overlap, e) else (s, e)
+
+            # Close the chunk at the section end unless it is too small to stand alone
+            if current is not None and self._length(text, *current) >= self._chunk_size * MIN_FILL:
+                spans.append(current)
+                current = None
+
+        if current is not None:
+            spans.append(current)
+        return spans
@@ -1,14 +1,32 @@
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
 from tracker_integration import get_tracker, get_calc
+from embedding_cache import get_embedding_cache
+from hierarchical_index import get_hierarchical_index
+from ann_index import (
+    AUTO_ANN_THRESHOLD, DEFAULT_EF_SEARCH, DEFAULT_NPROBE, QUANTIZED_TYPES,
+    build_faiss_index, choose_index_type, RescoredIndex,
+)
 import time
 
 
 def build_semantic_index(pdf_text: str, chunk_size: int = 300, 
-                        chunk_overlap: int = 50, track: bool = True):
+                        chunk_overlap: int = 50, track: bool = True,
+                        index_type: str = "auto", nprobe: int = DEFAULT_NPROBE,
+                        ef_search: int = DEFAULT_EF_SEARCH,
+                        ann_threshold: int = AUTO_ANN_THRESHOLD,
+                        rescore_factor: int = 4):
     """
     Build a FAISS semantic index with agent tracking.
+    index_type is "auto" (flat, HNSW above ann_threshold chunks), "flat",
+    "ivf_flat", "ivf_pq", "hnsw", or the compressed "sq8" / "pq"; nprobe /
+    ef_search tune the ANN search. Compressed backends fetch
+    rescore_factor * k candidates and re-score them exactly against the
+    full-precision vectors the hierarchy already holds, as VectorIndex
+    does (rescore_factor=1 ranks by the codes alone).
+    The chunks and vectors come from the document's hierarchical index,
+    shared with the Q&A tab, so no text is embedded twice.
     """
     tracker = get_tracker()
     calc = get_calc()
@@ -24,21 +42,9 @@ def build_semantic_index(pdf_text: str, chunk_size: int = 300,
         print(f" Building index with chunk_size={chunk_size}, overlap={chunk_overlap}")
         print(f" Input text length: {len(pdf_text)} characters")
         
-        # Initialize embedding model
-        embed_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-        print(" Embedding model loaded")
-        
-        # Split text
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", ", ", " ", ""]
-        )
-        texts = text_splitter.split_text(pdf_text)
-        
-        # Clean up chunks
-        texts = [' '.join(text.split()) for text in texts if text.strip()]
+        # Cleaned chunks and their vectors
+        hierarchy = get_hierarchical_index(pdf_text, chunk_size, chunk_overlap)
+        texts = hierarchy.child_texts
         
         print(f" Split into {len(texts)} chunks")
         
@@ -46,12 +52,24 @@ def build_semantic_index(pdf_text: str, chunk_size: int = 300,
             raise ValueError("No text chunks created from PDF")
         
         # Create FAISS index
-        vectordb = FAISS.from_texts(texts, embed_model)
+        resolved_type = choose_index_type(len(texts), index_type, ann_threshold)
+        index = build_faiss_index(hierarchy.child_vectors, resolved_type, nprobe=nprobe, ef_search=ef_search)
+        if resolved_type in QUANTIZED_TYPES and rescore_factor > 1:
+            index = RescoredIndex(index, hierarchy.child_vectors, rescore_factor)
+        vectordb = FAISS(
+            embedding_function=hierarchy.embeddings,
+            index=index,
+            docstore=InMemoryDocstore({str(i): Document(page_content=t) for i, t in enumerate(texts)}),
+            index_to_docstore_id={i: str(i) for i in range(len(texts))}
+        )
         
         duration = time.time() - start
-        print(f" Semantic index created with {len(texts)} chunks in {duration:.2f}s")
+        cache_stats = get_embedding_cache().stats()
+        print(f" Semantic index ({resolved_type}) created with {len(texts)} chunks in {duration:.2f}s "
+              f"(embedding cache hit rate {cache_stats['hit_rate']:.0%})")
         
         if track:
+            tracker.log_action("embedding_cache", **cache_stats)
             tracker.add_reward(calc.task_completion(True),
                              f"Semantic index built ({len(texts)} chunks)")
             tracker.add_reward(calc.response_time(duration, 10.0),
@@ -0,0 +1,148 @@
+# sqlite_store.py - SQLite storage shared by the embedding cache, response cache and summary store
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SQLiteStore:
+    """
+    A SQLite database in WAL mode, usable from several threads (one
+    connection guarded by _lock) and several processes. Subclasses list
+    their CREATE statements in SCHEMA and their tables in TABLES.
+    """
+
+    SCHEMA: Sequence[str] = ()
+    TABLES: Sequence[str] = ()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            for table in self.TABLES:
+                self._db.execute(f"DELETE FROM {table}")
+            self._db.commit()
+
+
+class SQLiteLRUStore(SQLiteStore):
+    """
+    A single-table SQLiteStore with a byte budget. TABLE holds the
+    entries, SIZE_COLUMN the payload whose length is counted, KEY_COLUMNS
+    the primary key and a last_used column the recency. Once the payload
+    exceeds max_bytes, least recently used entries are evicted (and, with
+    a ttl, entries whose created column is older than ttl seconds).
+    hits / misses are counted per process (see stats()).
+    """
+
+    TABLE = ""
+    SIZE_COLUMN = ""
+    KEY_COLUMNS: Sequence[str] = ()
+
+    # Fraction of max_bytes kept after an eviction pass
+    EVICT_TO = 0.9
+
+    def __init__(self, path: str, max_bytes: int, ttl: Optional[float] = None):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute(
+            f"SELECT COALESCE(SUM(LENGTH({self.SIZE_COLUMN})), 0) FROM {self.TABLE}"
+        ).fetchone()[0]
+
+    def _grew(self, added_bytes: int):
+        """Account for written entries and evict if over budget; call with _lock held, after commit"""
+        self._bytes += added_bytes
+        if self._bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones down to EVICT_TO * max_bytes"""
+        if self.ttl is not None:
+            self._db.execute(f"DELETE FROM {self.TABLE} WHERE created < ?", (time.time() - self.ttl,))
+
+        # Other processes may have written too, so recount first
+        self._bytes = self._stored_bytes()
+        excess = self._bytes - int(self.max_bytes * self.EVICT_TO)
+        if excess <= 0:
+            self._db.commit()
+            return
+
+        keys = ", ".join(self.KEY_COLUMNS)
+        freed = 0
+        doomed = []
+        for *key, size in self._db.execute(
+            f"SELECT {keys}, LENGTH({self.SIZE_COLUMN}) FROM {self.TABLE} ORDER BY last_used"
+        ):
+            doomed.append(key)
+            freed += size
+            if freed >= excess:
+                break
+
+        where = " AND ".join(f"{column} = ?" for column in self.KEY_COLUMNS)
+        self._db.executemany(f"DELETE FROM {self.TABLE} WHERE {where}", doomed)
+        self._db.commit()
+        self._bytes -= freed
+        self.evictions += len(doomed)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict:
+        """Hit / miss counters and on-disk size"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'evictions': self.evictions,
+            'entries': len(self),
+            'size_mb': self._bytes / (1024 * 1024),
+            'max_mb': self.max_bytes / (1024 * 1024)
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.TABLE}")
+            self._db.commit()
+            self._bytes = 0
+
+
+def process_wide(factory: Callable[[], T]) -> Callable[[], T]:
+    """Getter returning one instance of factory() per process, created on first call"""
+    instance = None
+    lock = threading.Lock()
+
+    def get() -> T:
+        nonlocal instance
+        with lock:
+            if instance is None:
+                instance = factory()
+            return instance
+
+    return get
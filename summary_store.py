@@ -0,0 +1,98 @@
+# summary_store.py - Checkpoints of document summarization jobs
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlite_store import SQLiteStore, process_wide
+
+
+DEFAULT_STORE_PATH = os.path.join(os.getenv("CACHE_DIR", ".cache"), "summaries.sqlite")
+
+
+def job_key(doc_hash: str, chunk_size: int, chunk_overlap: int,
+            extract_fraction: Optional[float] = None) -> str:
+    """Sections depend on the splitter, split and pre-selection parameters, so they are part of the key"""
+    key = f"{doc_hash}:section:{chunk_size}:{chunk_overlap}"
+    return f"{key}:x{extract_fraction:g}" if extract_fraction else key
+
+
+class SummaryStore(SQLiteStore):
+    """
+    Per-section summaries and final summaries of summarization jobs,
+    stored in SQLite as they complete. Section summaries are keyed by the
+    content hash of the section text, so they stay valid when the
+    document is edited elsewhere or re-split into the same sections; a
+    job interrupted by a rerun or a timeout resumes from the sections
+    already stored. A finished job returns its final summary without any
+    LLM call.
+    """
+
+    SCHEMA = (
+        # Checkpoints keyed by section position, from before content hashing
+        "DROP TABLE IF EXISTS sections",
+        "DROP TABLE IF EXISTS jobs",
+        "CREATE TABLE IF NOT EXISTS section_summaries ("
+        " section TEXT PRIMARY KEY, summary TEXT NOT NULL, created REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS job_summaries ("
+        " job TEXT PRIMARY KEY, sections TEXT NOT NULL, summary TEXT NOT NULL,"
+        " created REAL NOT NULL)",
+    )
+    TABLES = ("section_summaries", "job_summaries")
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        super().__init__(path)
+
+    def get_sections(self, sections: List[str]) -> Dict[str, str]:
+        """Stored summaries of the given sections, by section key"""
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(sections), 500):
+                batch = sections[start:start + 500]
+                found.update(self._db.execute(
+                    "SELECT section, summary FROM section_summaries WHERE section IN "
+                    f"({','.join('?' * len(batch))})", batch
+                ).fetchall())
+        return found
+
+    def put_section(self, section: str, summary: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO section_summaries (section, summary, created) VALUES (?, ?, ?)",
+                (section, summary, time.time())
+            )
+            self._db.commit()
+
+    def get_summary(self, job: str) -> Optional[Tuple[str, List[str]]]:
+        """Final summary of a completed job and the keys of its sections"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, sections FROM job_summaries WHERE job = ?", (job,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put_summary(self, job: str, summary: str, sections: List[str]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_summaries (job, sections, summary, created) VALUES (?, ?, ?, ?)",
+                (job, json.dumps(sections), summary, time.time())
+            )
+            self._db.commit()
+
+    def forget(self, job: str, sections: List[str] = ()):
+        """Drop a job and the given section summaries so the next run starts from scratch"""
+        with self._lock:
+            self._db.executemany("DELETE FROM section_summaries WHERE section = ?",
+                                 [(section,) for section in sections])
+            self._db.execute("DELETE FROM job_summaries WHERE job = ?", (job,))
+            self._db.commit()
+
+
+_shared_store = process_wide(SummaryStore)
+
+
+def get_summary_store() -> SummaryStore:
+    """Process-wide summary store"""
+    return _shared_store()
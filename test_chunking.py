@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the chunk service and the section-aware chunker
+Checks that chunk offsets reproduce the splitter's chunks exactly and
+that SectionChunker loses no text and never exceeds chunk_size, on
+synthetic text (repeated words, headings, hard-wrapped lines), so no
+PDF, embedding model or Ollama is needed.
+"""
+
+import random
+import sys
+import textwrap
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from chunk_service import _recursive_spans, split_text
+from section_chunker import SectionChunker
+
+
+WORDS = "a an the model data set token attention layer x y".split()
+SEPARATORS = [" ", " ", " ", "\n", "\n\n", ". "]
+HEADINGS = ["Abstract", "1 Introduction", "2 Related Work", "3. Method", "3.1 Training Details",
+            "IV. EXPERIMENTS", "Results", "Discussion", "5 Conclusion", "References"]
+
+
+def make_text(rng: random.Random, num_words: int) -> str:
+    """Short, repetitive text: the same chunk string often occurs several times"""
+    return "".join(rng.choice(WORDS) + rng.choice(SEPARATORS) for _ in range(num_words))
+
+
+def make_paper(rng: random.Random, chunk_size: int) -> str:
+    """
+    Paper-like text: headings, paragraphs that are either hard-wrapped
+    (as PyPDF2 extracts them) or blank-line separated, and now and then a
+    sentence longer than chunk_size
+    """
+    lines = []
+    for heading in HEADINGS:
+        lines.append(heading)
+        for _ in range(rng.randint(1, 6)):
+            sentences = []
+            for _ in range(rng.randint(1, 12)):
+                length = rng.randint(4, 30) if rng.random() > 0.03 else chunk_size // 3
+                sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+            paragraph = " ".join(sentences)
+            if rng.random() < 0.5:
+                lines.extend(textwrap.wrap(paragraph, rng.choice((70, 90, 120))))
+            else:
+                lines.extend([paragraph, ""])
+    return "\n".join(lines)
+
+
+def test_section_chunker_covers_text():
+    """SectionChunker chunks cover every non-space character and fit chunk_size"""
+    print("\n📑 Testing section chunker...")
+    rng = random.Random(1)
+    all_good = True
+
+    for chunk_size, chunk_overlap in ((200, 50), (600, 100), (800, 100), (1500, 100), (2000, 200)):
+        chunker = SectionChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        lost = oversized = unordered = 0
+        cases = 50
+        for _ in range(cases):
+            text = make_paper(rng, chunk_size)
+            spans = chunker.split_spans(text)
+
+            covered = bytearray(len(text))
+            for start, end in spans:
+                covered[start:end] = b"\x01" * (end - start)
+            if any(not covered[i] and not c.isspace() for i, c in enumerate(text)):
+                lost += 1
+            if any(end - start > chunk_size for start, end in spans):
+                oversized += 1
+            if any(a[0] >= b[0] or a[1] > b[1] for a, b in zip(spans, spans[1:])):
+                unordered += 1
+
+        if lost or oversized or unordered:
+            print(f"❌ {chunk_size}/{chunk_overlap}: text lost in {lost}, oversized chunks in "
+                  f"{oversized}, unordered spans in {unordered} of {cases} papers")
+            all_good = False
+        else:
+            print(f"✅ {chunk_size}/{chunk_overlap}: no text lost, no chunk over size in {cases} papers")
+
+    return all_good
+
+
+def test_recursive_spans_round_trip():
+    """Recursive chunk offsets slice out exactly the splitter's chunks"""
+    print("\n✂️  Testing recursive chunk offsets...")
+    rng = random.Random(0)
+    all_good = True
+
+    for chunk_size, chunk_overlap in ((10, 0), (20, 5), (30, 10), (50, 30), (80, 40), (300, 50)):
+        mismatches = 0
+        cases = 200
+        for _ in range(cases):
+            text = make_text(rng, rng.randint(5, 150))
+            expected = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            ).split_text(text)
+            spans = _recursive_spans(text, chunk_size, chunk_overlap)
+            if any(start < 0 for start, _ in spans) or [text[s:e] for s, e in spans] != expected:
+                mismatches += 1
+
+        if mismatches:
+            print(f"❌ {chunk_size}/{chunk_overlap}: {mismatches} of {cases} texts have wrong offsets")
+            all_good = False
+        else:
+            print(f"✅ {chunk_size}/{chunk_overlap}: offsets match the splitter on {cases} texts")
+
+    # Through the public entry point (small sizes use the recursive splitter)
+    text = make_text(rng, 400)
+    chunks = split_text(text, 50, 30)
+    expected = RecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=30).split_text(text)
+    if list(chunks) != expected:
+        print("❌ split_text(50, 30) differs from the splitter")
+        all_good = False
+    else:
+        print(f"✅ split_text(50, 30): {len(chunks)} chunks match the splitter")
+
+    return all_good
+
+
+def main():
+    print("=" * 60)
+    print("🧪 ATHENA CHUNKING TESTS")
+    print("=" * 60)
+
+    results = [
+        ("Recursive chunk offsets", test_recursive_spans_round_trip()),
+        ("Section chunker keeps all text", test_section_chunker_covers_text()),
+    ]
+
+    print("\n" + "=" * 60)
+    print("📊 TEST SUMMARY")
+    print("=" * 60)
+
+    for test_name, passed in results:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {test_name}")
+
+    passed_count = sum(1 for _, p in results if p)
+    print(f"\nTotal: {passed_count}/{len(results)} tests passed")
+    return 0 if passed_count == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
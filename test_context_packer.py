@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests for the context packer
+Checks that packed prompts stay within the token budget, keep the
+retrieval ranking and merge overlapping neighbours back into the
+original text, using synthetic documents (no embedding model or Ollama).
+"""
+
+import random
+import sys
+
+from context_packer import estimate_tokens, pack_context
+
+
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 80
+
+
+def make_document(rng: random.Random, num_sentences: int = 60) -> str:
+    words = "attention encoder decoder retrieval dataset benchmark latency gradient token layer".split()
+    return " ".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(6, 14))).capitalize() + f" ({i})."
+        for i in range(num_sentences)
+    )
+
+
+def make_chunks(doc_id: str, text: str):
+    """Overlapping fixed-size chunks, as (text, metadata) pairs"""
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    return [
+        (text[start:start + CHUNK_SIZE],
+         {'doc_id': doc_id, 'doc_title': f"Paper {doc_id}", 'chunk_index': i})
+        for i, start in enumerate(range(0, len(text) - CHUNK_OVERLAP, step))
+    ]
+
+
+def ranked_contexts(rng: random.Random, num_docs: int = 4, k: int = 12):
+    """k chunks drawn from num_docs documents, with decreasing similarity"""
+    documents = {f"doc_{d}": make_document(rng) for d in range(num_docs)}
+    pool = [chunk for doc_id, text in documents.items() for chunk in make_chunks(doc_id, text)]
+    picked = rng.sample(pool, k)
+    return documents, [(text, metadata, 1.0 - 0.05 * r) for r, (text, metadata) in enumerate(picked)]
+
+
+def test_budget_respected():
+    """The packed context never exceeds the token budget"""
+    print("\n📏 Testing token budget...")
+    rng = random.Random(0)
+    over = []
+    cases = 0
+
+    for budget in (60, 150, 300, 600, 1000, 1500, 4000):
+        for case in range(50):
+            _, contexts = ranked_contexts(rng)
+            if case % 2:
+                # No sentence ends: truncation falls back to word boundaries
+                contexts = [(text.replace(".", ""), metadata, sim) for text, metadata, sim in contexts]
+            packed = pack_context(contexts, token_budget=budget)
+            cases += 1
+            if packed.tokens > budget or estimate_tokens(packed.text) != packed.tokens:
+                over.append((budget, packed.tokens))
+
+    if over:
+        print(f"❌ {len(over)} of {cases} contexts over budget, e.g. {over[:3]}")
+        return False
+    print(f"✅ {cases} contexts within budgets from 60 to 4000 tokens")
+    return True
+
+
+def test_rank_order_and_merging():
+    """Spans follow the best rank of their chunks and merged neighbours match the document"""
+    print("\n🔗 Testing span order and merging...")
+    rng = random.Random(1)
+    all_good = True
+    merged_spans = 0
+
+    for _ in range(100):
+        documents, contexts = ranked_contexts(rng)
+        packed = pack_context(contexts, token_budget=100_000)
+
+        ranks = [span.rank for span in packed.spans]
+        if ranks != sorted(ranks):
+            print(f"❌ spans out of rank order: {ranks}")
+            all_good = False
+            break
+
+        # The top-ranked chunk always leads the context
+        if not packed.spans or packed.spans[0].rank != 0:
+            print("❌ best-ranked chunk is not the first source")
+            all_good = False
+            break
+
+        for span in packed.spans:
+            if span.text not in documents[span.doc_id]:
+                print(f"❌ span {span.doc_id} {span.chunk_indices} is not a slice of its document")
+                all_good = False
+                break
+            if len(span.chunk_indices) > 1:
+                merged_spans += 1
+
+        # Every retrieved chunk ends up in the context exactly once
+        retrieved = {(m['doc_id'], m['chunk_index']) for _, m, _ in contexts}
+        packed_chunks = [(s.doc_id, i) for s in packed.spans for i in s.chunk_indices]
+        if sorted(packed_chunks) != sorted(retrieved):
+            print("❌ packed chunks differ from the retrieved ones")
+            all_good = False
+            break
+
+    if all_good:
+        print(f"✅ spans in rank order, {merged_spans} merged neighbour runs match the documents")
+    return all_good
+
+
+def test_redundant_chunks_dropped():
+    """A document retrieved twice under different ids is only packed once"""
+    print("\n♻️  Testing redundant chunks...")
+    rng = random.Random(2)
+    text = make_document(rng)
+    original = make_chunks("doc_a", text)[:3]
+    duplicate = [(t, {**m, 'doc_id': "doc_b"}) for t, m in original]
+    contexts = [(t, m, 0.9 - 0.1 * i) for i, (t, m) in enumerate(original + duplicate)]
+
+    packed = pack_context(contexts, token_budget=100_000)
+    if len(packed.spans) != 1 or packed.dropped_chunks != 3 or packed.tokens_saved <= 0:
+        print(f"❌ {len(packed.spans)} spans, {packed.dropped_chunks} dropped, "
+              f"{packed.tokens_saved} tokens saved")
+        return False
+    print(f"✅ duplicate document dropped, {packed.tokens_saved} tokens saved")
+    return True
+
+
+def main():
+    print("=" * 60)
+    print("🧪 ATHENA CONTEXT PACKER TESTS")
+    print("=" * 60)
+
+    results = [
+        ("Token budget respected", test_budget_respected()),
+        ("Rank order and merging", test_rank_order_and_merging()),
+        ("Redundant chunks dropped", test_redundant_chunks_dropped()),
+    ]
+
+    print("\n" + "=" * 60)
+    print("📊 TEST SUMMARY")
+    print("=" * 60)
+
+    for test_name, passed in results:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {test_name}")
+
+    passed_count = sum(1 for _, p in results if p)
+    print(f"\nTotal: {passed_count}/{len(results)} tests passed")
+    return 0 if passed_count == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
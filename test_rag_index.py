@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Tests for the Advanced RAG index (VectorIndex + BM25)
+Checks tombstones, compaction, save/load and filtered search on the
+exact (flat) and approximate (hnsw) backends with synthetic vectors,
+so no embedding model or Ollama is needed.
+"""
+
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+DIM = 32
+NUM_DOCS = 20
+CHUNKS_PER_DOC = 15
+BACKENDS = ("flat", "hnsw")
+
+
+def make_corpus(seed: int = 0):
+    """{doc_id: (texts, vectors, metadatas)}; every chunk text has a unique token"""
+    rng = np.random.default_rng(seed)
+    corpus = {}
+    for d in range(NUM_DOCS):
+        center = rng.standard_normal(DIM).astype(np.float32)
+        vectors = center + 0.3 * rng.standard_normal((CHUNKS_PER_DOC, DIM)).astype(np.float32)
+        texts = [f"paper {d} section {c} token d{d}c{c}" for c in range(CHUNKS_PER_DOC)]
+        metadatas = [{'doc_id': f"doc_{d}", 'chunk': c} for c in range(CHUNKS_PER_DOC)]
+        corpus[f"doc_{d}"] = (texts, vectors, metadatas)
+    return corpus
+
+
+def build_index(corpus, index_type: str) -> VectorIndex:
+    index = VectorIndex(index_type=index_type)
+    for doc_id, (texts, vectors, metadatas) in corpus.items():
+        index.add(doc_id, texts, vectors, metadatas)
+    index.wait_for_background()
+    return index
+
+
+def hit_docs(index: VectorIndex, hits) -> set:
+    return {index.metadatas[row]['doc_id'] for row, _ in hits}
+
+
+def test_removed_docs_never_returned():
+    """add -> remove -> search never returns a removed document"""
+    print("\n🗑️  Testing removed documents...")
+    corpus = make_corpus()
+    removed = [f"doc_{d}" for d in (0, 3, 7, 12, 19)]
+    all_good = True
+
+    for index_type in BACKENDS:
+        index = build_index(corpus, index_type)
+        for doc_id in removed:
+            index.remove(doc_id)
+        # Re-adding a document replaces its rows
+        texts, vectors, metadatas = corpus["doc_5"]
+        index.add("doc_5", texts, vectors, metadatas)
+
+        for stage in ("tombstoned", "compacted"):
+            queries = np.concatenate([corpus[d][1] for d in removed])
+            leaked = set()
+            for hits in index.search_batch(queries, k=10):
+                leaked |= hit_docs(index, hits) & set(removed)
+
+            tokens = [f"d{d}c{c}" for d in (0, 3, 7, 12, 19) for c in range(CHUNKS_PER_DOC)]
+            for hits in index.lexical_search_batch(tokens, k=10):
+                leaked |= hit_docs(index, hits) & set(removed)
+
+            live = len(index) == (NUM_DOCS - len(removed)) * CHUNKS_PER_DOC
+            if leaked or not live:
+                print(f"❌ {index_type} ({stage}): returned {sorted(leaked)}, {len(index)} live chunks")
+                all_good = False
+            else:
+                print(f"✅ {index_type} ({stage}): no removed document in dense or BM25 results")
+            index.compact()
+
+    return all_good
+
+
+def test_compaction_keeps_rows_aligned():
+    """Compaction keeps BM25 and ANN rows aligned with texts and vectors"""
+    print("\n🧹 Testing compaction alignment...")
+    corpus = make_corpus(seed=1)
+    all_good = True
+
+    for index_type in BACKENDS:
+        index = build_index(corpus, index_type)
+        for d in range(0, NUM_DOCS, 2):
+            index.remove(f"doc_{d}")
+        if not index.maybe_compact(background=False):
+            print(f"❌ {index_type}: compaction did not run")
+            all_good = False
+            continue
+
+        expected = {t: v for texts, vectors, _ in corpus.values() for t, v in zip(texts, vectors)}
+        misaligned = 0
+        for row in range(len(index)):
+            text = index.texts[row]
+            token = text.split()[-1]
+            lexical = index.lexical_search_batch([token], k=1)[0]
+            dense = index.search(index.vectors[row], k=1)
+            if (not np.allclose(index.vectors[row], expected[text])
+                    or not lexical or lexical[0][0] != row
+                    or not dense or dense[0][0] != row):
+                misaligned += 1
+
+        if misaligned:
+            print(f"❌ {index_type}: {misaligned} of {len(index)} rows misaligned after compaction")
+            all_good = False
+        else:
+            print(f"✅ {index_type}: {len(index)} rows aligned (vectors, BM25, "
+                  f"{'ANN' if index_type != 'flat' else 'exact'} search)")
+
+    return all_good
+
+
+def test_save_load_identical():
+    """save -> load -> search gives identical results"""
+    print("\n💾 Testing save / load...")
+    corpus = make_corpus(seed=2)
+    rng = np.random.default_rng(3)
+    queries = rng.standard_normal((20, DIM)).astype(np.float32)
+    words = ["paper", "section 4", "d2c3", "token d9c1 paper"]
+    selection = ["doc_1", "doc_4", "doc_8"]
+    all_good = True
+
+    for index_type in BACKENDS:
+        index = build_index(corpus, index_type)
+        index.remove("doc_6")
+        path = tempfile.mkdtemp()
+        try:
+            index.save(path)
+            loaded = VectorIndex.load(path, index_type=index_type)
+
+            same = (
+                index.search_batch(queries, k=5) == loaded.search_batch(queries, k=5)
+                and index.search_batch(queries, k=5, doc_ids=selection)
+                == loaded.search_batch(queries, k=5, doc_ids=selection)
+                and index.lexical_search_batch(words, k=5) == loaded.lexical_search_batch(words, k=5)
+                and [index.texts[r] for r in range(len(index))] == list(loaded.texts)
+            )
+            if same:
+                print(f"✅ {index_type}: loaded index returns identical results")
+            else:
+                print(f"❌ {index_type}: loaded index returns different results")
+                all_good = False
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    return all_good
+
+
+def test_filtered_search():
+    """Filtered search returns only the allowed documents"""
+    print("\n🔎 Testing filtered search...")
+    corpus = make_corpus(seed=4)
+    rng = np.random.default_rng(5)
+    queries = rng.standard_normal((20, DIM)).astype(np.float32)
+    all_good = True
+
+    for index_type in BACKENDS:
+        index = build_index(corpus, index_type)
+        index.remove("doc_2")
+
+        for exact_rows in (VectorIndex.EXACT_FILTER_ROWS, 0):
+            # EXACT_FILTER_ROWS=0 forces the masked search path
+            index.EXACT_FILTER_ROWS = exact_rows
+            for allowed in (["doc_1"], ["doc_2", "doc_3"], [f"doc_{d}" for d in range(0, NUM_DOCS, 3)]):
+                live = set(allowed) - {"doc_2"}
+                results = index.search_batch(queries, k=5, doc_ids=allowed)
+                lexical = index.lexical_search_batch(["paper section"], k=50, doc_ids=allowed)[0]
+                outside = set().union(*(hit_docs(index, hits) for hits in results)) - live
+                outside |= hit_docs(index, lexical) - live
+                full = all(len(hits) == 5 for hits in results)
+
+                path = "subset" if exact_rows else "mask"
+                if outside or not full:
+                    print(f"❌ {index_type} ({path}, {len(allowed)} docs): returned {sorted(outside)}")
+                    all_good = False
+        if all_good:
+            print(f"✅ {index_type}: only allowed documents returned (subset and mask paths)")
+
+    return all_good
+
+
+def test_filtered_matches_brute_force():
+    """doc_ids-filtered search returns the brute-force nearest chunks of the selection"""
+    print("\n🎯 Testing filtered search against brute force...")
+    corpus = make_corpus(seed=6)
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((30, DIM)).astype(np.float32)
+    k = 5
+    all_good = True
+
+    for index_type in BACKENDS:
+        index = build_index(corpus, index_type)
+        index.remove("doc_9")
+
+        for exact_rows in (VectorIndex.EXACT_FILTER_ROWS, 0):
+            index.EXACT_FILTER_ROWS = exact_rows
+            path = "subset" if exact_rows else "mask"
+            for allowed in (["doc_4"], ["doc_9", "doc_10"], [f"doc_{d}" for d in range(1, NUM_DOCS, 2)]):
+                rows = np.concatenate([index.doc_rows[d] for d in allowed if d in index.doc_rows]
+                                      or [np.empty(0, dtype=np.int64)])
+                distances = ((index.vectors[rows][None, :, :] - queries[:, None, :]) ** 2).sum(axis=2)
+                expected = [set(rows[np.argsort(d, kind='stable')[:k]]) for d in distances]
+
+                results = index.search_batch(queries, k=k, doc_ids=allowed)
+                found = [{row for row, _ in hits} for hits in results]
+                recall = np.mean([len(f & e) / k for f, e in zip(found, expected)])
+
+                # The ANN backend may miss a neighbour on the mask path only
+                needed = 0.9 if index_type != "flat" and path == "mask" else 1.0
+                if recall < needed:
+                    print(f"❌ {index_type} ({path}, {len(allowed)} docs): recall {recall:.2f}")
+                    all_good = False
+        if all_good:
+            print(f"✅ {index_type}: filtered results match brute force over the selection")
+
+    return all_good
+
+
+def main():
+    print("=" * 60)
+    print("🧪 ATHENA RAG INDEX TESTS")
+    print("=" * 60)
+
+    results = [
+        ("Removed documents never returned", test_removed_docs_never_returned()),
+        ("Compaction keeps rows aligned", test_compaction_keeps_rows_aligned()),
+        ("Save / load identical", test_save_load_identical()),
+        ("Filtered search", test_filtered_search()),
+        ("Filtered search matches brute force", test_filtered_matches_brute_force()),
+    ]
+
+    print("\n" + "=" * 60)
+    print("📊 TEST SUMMARY")
+    print("=" * 60)
+
+    for test_name, passed in results:
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status}: {test_name}")
+
+    passed_count = sum(1 for _, p in results if p)
+    print(f"\nTotal: {passed_count}/{len(results)} tests passed")
+    return 0 if passed_count == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -121,8 +121,8 @@ def render_themed_sidebar():
         st.markdown("<h2>🔧 System Status</h2>", unsafe_allow_html=True)
 
         try:
-            import requests
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
+            from ollama_client import get_ollama_client
+            response = get_ollama_client().get("/api/tags", timeout=2)
 
             if response.status_code == 200:
                 st.success("✓ Ollama: Running")
@@ -0,0 +1,775 @@
+# vector_index.py - Shared chunk embedding store for Advanced RAG
+
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from bm25_index import BM25Index
+from ann_index import (
+    AUTO_ANN_THRESHOLD, DEFAULT_EF_SEARCH, DEFAULT_NPROBE, QUANTIZED_TYPES,
+    build_faiss_index, choose_index_type, index_type_of, search_parameters,
+)
+
+
+INDEX_FORMAT_VERSION = 1
+
+
+class MappedList:
+    """
+    Read-mostly list of strings backed by a memory-mapped blob.
+
+    Items are stored as UTF-8 bytes in one file plus an offsets array, and
+    are only decoded when accessed. Appends go to an in-memory tail.
+    """
+
+    def __init__(self, blob_path: str, offsets_path: str, decode: Callable = None):
+        self._offsets = np.load(offsets_path, mmap_mode='r')
+        self._mapped_count = len(self._offsets) - 1
+        if os.path.getsize(blob_path) > 0:
+            self._blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        else:
+            self._blob = np.empty(0, dtype=np.uint8)
+        self._decode = decode
+        self._tail: List = []
+
+    def __len__(self) -> int:
+        return self._mapped_count + len(self._tail)
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if i >= self._mapped_count:
+            return self._tail[i - self._mapped_count]
+        if i < 0:
+            raise IndexError(i)
+
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        value = self._blob[start:end].tobytes().decode('utf-8')
+        return self._decode(value) if self._decode else value
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, item):
+        self._tail.append(item)
+
+    def extend(self, items):
+        self._tail.extend(items)
+
+
+def _write_blob(items, blob_path: str, offsets_path: str, encode: Callable = None):
+    """Write strings as one UTF-8 blob plus an offsets array"""
+    offsets = [0]
+    with open(blob_path, 'wb') as f:
+        for item in items:
+            data = (encode(item) if encode else item).encode('utf-8')
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    np.save(offsets_path, np.asarray(offsets, dtype=np.int64))
+
+
+class VectorIndex:
+    """
+    Single embedding matrix serving both global and per-document search.
+
+    Every chunk is stored once: one row in the vector matrix plus its text
+    and metadata. Filtering by document uses a boolean row mask over the
+    same matrix instead of separate per-document indexes.
+
+    Distances are squared L2, the same metric as a flat FAISS index, so
+    callers can keep converting them with 1 / (1 + distance).
+
+    save()/load() persist the matrix as a .npy file that is memory-mapped
+    on load, so reopening a large corpus does not read it into RAM.
+
+    Removing a document only tombstones its rows. Dead rows are skipped by
+    search and dropped by compact(), which maybe_compact() runs on a
+    background thread once enough of the matrix is dead. Row ids change
+    on compaction, so callers that map search hits back to texts should
+    hold `lock` across the search and the lookup.
+
+    index_type selects the search backend: "flat" scans the matrix
+    exactly, "ivf_flat", "ivf_pq" and "hnsw" search a FAISS index built
+    over it, and "auto" switches from flat to HNSW once the corpus reaches
+    ann_threshold chunks. The FAISS index is built on the background
+    thread as soon as add() makes an ANN backend active (searches stay
+    exact until it is ready), rebuilt there on compaction, and extended
+    incrementally as chunks are appended. nprobe and ef_search can be
+    changed at any time to trade recall for latency.
+
+    "hnsw" and "ivf_flat" hold their own float32 copy of every vector
+    next to the matrix: dim * 4 more bytes per chunk (1.5 KB at 384 dims,
+    ~150 MB per 100k chunks), plus about HNSW_M * 8 bytes of graph links
+    per chunk for HNSW.
+
+    "sq8" (int8 scalar quantization) and "pq" (product quantization) scan
+    compressed codes instead of the float vectors; like "ivf_pq", their
+    top rescore_factor * k hits are re-scored exactly against the full
+    vectors. Those are never held in RAM: they live in a memory-mapped
+    temporary file (the store's vectors.npy once saved and loaded), so
+    only the rows being re-scored are paged in. resident_bytes() reports
+    what the index actually keeps in memory.
+
+    With lexical=True a BM25 inverted index over the chunk texts is kept
+    in step with the vectors (see lexical_search_batch).
+    """
+
+    # Rows scored per block when vectors are not stored as float32
+    BLOCK_ROWS = 65536
+    # Max size of one (queries x rows) distance block in batched search
+    BLOCK_ELEMENTS = 1 << 24
+    # Fraction of dead rows that triggers background compaction
+    COMPACT_RATIO = 0.25
+    # doc_ids filters selecting at most this many rows are scored exactly
+    # over just those rows, whatever the backend
+    EXACT_FILTER_ROWS = 20_000
+    # With the flat backend, scoring the selected rows beats a masked full
+    # scan until the selection covers this fraction of the index
+    SUBSET_FRACTION = 0.25
+
+    def __init__(self, dim: Optional[int] = None, index_type: str = "auto",
+                 ann_threshold: int = AUTO_ANN_THRESHOLD,
+                 nprobe: int = DEFAULT_NPROBE, ef_search: int = DEFAULT_EF_SEARCH,
+                 lexical: bool = True, rescore_factor: int = 4):
+        choose_index_type(0, index_type)  # validate early
+        self.dim = dim
+        self.index_type = index_type
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.rescore_factor = rescore_factor
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.doc_rows: Dict[str, np.ndarray] = {}
+        self.bm25: Optional[BM25Index] = BM25Index() if lexical else None
+        self.lock = threading.RLock()
+
+        # FAISS index over the first _ann_rows rows (None until an ANN backend is needed)
+        self._ann = None
+        self._ann_rows = 0
+        self._ann_path: Optional[str] = None
+        # Bumped whenever compaction renumbers the rows
+        self._layout = 0
+
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._size = 0
+        self._dead = 0
+        self._version = 0
+        self._background: Optional[threading.Thread] = None  # compaction or ANN build
+
+    def __len__(self) -> int:
+        """Number of live chunks"""
+        return self._size - self._dead
+
+    @property
+    def num_tombstones(self) -> int:
+        return self._dead
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the stored vectors (one row per chunk)"""
+        return self._vectors[:self._size]
+
+    @property
+    def active_index_type(self) -> str:
+        """Backend used for the next search"""
+        return choose_index_type(len(self), self.index_type, self.ann_threshold)
+
+    def add(self, doc_id: str, texts: List[str], vectors, metadatas: List[Dict]) -> np.ndarray:
+        """
+        Append a document's chunks, returns the row ids assigned to them.
+        Rows previously held by doc_id are tombstoned.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) != len(vectors) or len(texts) != len(metadatas):
+            raise ValueError("texts, vectors and metadatas must have the same length")
+
+        with self.lock:
+            self.remove(doc_id)
+
+            if vectors.size == 0:
+                rows = np.empty(0, dtype=np.int64)
+                self.doc_rows[doc_id] = rows
+                return rows
+
+            if self.dim is None or self._vectors.shape[1] == 0:
+                self.dim = vectors.shape[1]
+                self._vectors = np.empty((0, self.dim), dtype=np.float32)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+
+            start = self._size
+            end = start + len(vectors)
+            self._reserve(end)
+
+            self._vectors[start:end] = vectors
+            self._sq_norms[start:end] = np.einsum('ij,ij->i', vectors, vectors)
+            self._alive[start:end] = True
+            self._size = end
+            self._version += 1
+
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas)
+            if self.bm25 is not None:
+                self.bm25.add(start, texts)
+
+            # Build the ANN index now rather than inside the first search after the switch
+            if self._ann is None and self._ann_path is None and self.active_index_type != "flat":
+                self._start_background(self.build_ann)
+
+            rows = np.arange(start, end, dtype=np.int64)
+            self.doc_rows[doc_id] = rows
+            return rows
+
+    def _reserve(self, capacity: int):
+        """Grow the backing buffers geometrically so appends stay amortized O(1)"""
+        if capacity <= len(self._vectors):
+            return
+
+        new_capacity = max(capacity, 2 * len(self._vectors), 64)
+
+        # Also converts memory-mapped (possibly float16) vectors after load()
+        vectors = self._vector_buffer(new_capacity)
+        for start in range(0, self._size, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, self._size)
+            vectors[start:end] = self._vectors[start:end]
+        self._vectors = vectors
+
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        self._sq_norms = sq_norms
+
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+
+    def _vector_buffer(self, capacity: int) -> np.ndarray:
+        """float32 (capacity x dim) array, file-backed for quantized backends"""
+        if self.index_type not in QUANTIZED_TYPES or capacity == 0:
+            return np.empty((capacity, self.dim), dtype=np.float32)
+        # Anonymous temporary file, removed once the mapping is dropped
+        return np.memmap(tempfile.TemporaryFile(), dtype=np.float32, mode='w+',
+                         shape=(capacity, self.dim))
+
+    def resident_bytes(self) -> int:
+        """
+        Bytes of vector data held in RAM: the float matrix (unless memory-
+        mapped), norms, tombstone flags and the FAISS index. Mapped rows
+        are only paged in while read and are not counted.
+        """
+        with self.lock:
+            arrays = (self._vectors, self._sq_norms, self._alive)
+            total = sum(a.nbytes for a in arrays if not isinstance(a, np.memmap))
+            if self._ann is not None:
+                total += faiss.serialize_index(self._ann).nbytes
+            return total
+
+    def remove(self, doc_id: str) -> bool:
+        """Tombstone a document's rows, returns False if it was not indexed"""
+        with self.lock:
+            rows = self.doc_rows.pop(doc_id, None)
+            if rows is None:
+                return False
+
+            if len(rows):
+                self._alive[rows] = False
+                self._dead += len(rows)
+                self._version += 1
+            return True
+
+    def get_rows(self, rows) -> Tuple[List[str], np.ndarray]:
+        """Texts and float32 vectors of the given rows"""
+        with self.lock:
+            rows = np.asarray(rows, dtype=np.int64)
+            texts = [self.texts[int(r)] for r in rows]
+            return texts, np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def _start_background(self, target: Callable[[], bool]) -> bool:
+        """Run target on the background thread unless it is busy; call with lock held"""
+        if self._background is not None and self._background.is_alive():
+            return False
+        self._background = threading.Thread(target=target, daemon=True)
+        self._background.start()
+        return True
+
+    def wait_for_background(self):
+        """Block until a running background compaction or ANN build is done"""
+        background = self._background
+        if background is not None:
+            background.join()
+
+    def maybe_compact(self, background: bool = True) -> bool:
+        """Start compaction once dead rows exceed COMPACT_RATIO of the matrix"""
+        with self.lock:
+            if self._dead == 0 or self._dead < self.COMPACT_RATIO * self._size:
+                return False
+
+            if not background:
+                return self.compact()
+            return self._start_background(self.compact)
+
+    def compact(self) -> bool:
+        """
+        Drop tombstoned rows and renumber the live ones.
+        The copy runs outside the lock; if the index changed meanwhile the
+        result is discarded and the next maybe_compact() retries.
+        """
+        with self.lock:
+            if self._dead == 0:
+                return False
+            version = self._version
+            size = self._size
+            keep = self._alive[:size].copy()
+            vectors, sq_norms = self._vectors, self._sq_norms
+            texts, metadatas = self.texts, self.metadatas
+            doc_rows = dict(self.doc_rows)
+            ann_type = choose_index_type(size - self._dead, self.index_type, self.ann_threshold)
+            bm25 = self.bm25.snapshot() if self.bm25 is not None else None
+
+        # Appends only write past `size` and tombstones only touch _alive,
+        # so reading the first `size` rows here is safe
+        live = np.flatnonzero(keep)
+        new_vectors = self._vector_buffer(len(live))
+        for start in range(0, len(live), self.BLOCK_ROWS):
+            rows = live[start:start + self.BLOCK_ROWS]
+            new_vectors[start:start + len(rows)] = vectors[rows]
+        new_sq_norms = np.ascontiguousarray(sq_norms[live], dtype=np.float32)
+        new_texts = [texts[int(r)] for r in live]
+        new_metadatas = [metadatas[int(r)] for r in live]
+
+        new_ids = np.cumsum(keep) - 1
+        new_doc_rows = {d: new_ids[r] for d, r in doc_rows.items()}
+
+        new_bm25 = bm25.compacted(keep) if bm25 is not None else None
+
+        # FAISS ids are row ids, so an ANN index has to be rebuilt too
+        new_ann = None
+        if ann_type != "flat":
+            new_ann = build_faiss_index(new_vectors, ann_type, nprobe=self.nprobe,
+                                        ef_search=self.ef_search)
+
+        with self.lock:
+            if self._version != version:
+                return False
+
+            self._vectors = new_vectors
+            self._sq_norms = new_sq_norms
+            self._alive = np.ones(len(live), dtype=bool)
+            self._size = len(live)
+            self._dead = 0
+            self._version += 1
+            self.texts = new_texts
+            self.metadatas = new_metadatas
+            self.doc_rows = new_doc_rows
+            self.bm25 = new_bm25
+            self._ann = new_ann
+            self._ann_rows = len(live) if new_ann is not None else 0
+            self._ann_path = None
+            self._layout += 1
+
+        print(f" Index compacted: {size - len(live)} tombstones dropped, {len(live)} chunks")
+        return True
+
+    def doc_mask(self, doc_ids: List[str]) -> np.ndarray:
+        """Boolean row mask selecting the chunks of the given documents"""
+        with self.lock:
+            mask = np.zeros(self._size, dtype=bool)
+            mask[self.select_rows(doc_ids)] = True
+            return mask
+
+    def select_rows(self, doc_ids: List[str]) -> np.ndarray:
+        """Sorted live row ids of the given documents"""
+        with self.lock:
+            parts = [self.doc_rows[d] for d in doc_ids if d in self.doc_rows]
+            if not parts:
+                return np.empty(0, dtype=np.int64)
+            return np.sort(np.concatenate(parts))
+
+    def search(self, query_vector, k: int = 5, mask: np.ndarray = None,
+               doc_ids: List[str] = None) -> List[Tuple[int, float]]:
+        """
+        Nearest-neighbour search (exact unless an ANN backend is active).
+        Returns: [(row_id, squared_l2_distance), ...] sorted by distance
+        """
+        query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        return self.search_batch(query, k=k, mask=mask, doc_ids=doc_ids)[0]
+
+    def search_batch(self, query_vectors, k: int = 5, mask: np.ndarray = None,
+                     doc_ids: List[str] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Nearest-neighbour search for many queries at once.
+        All queries share the same optional row mask and/or doc_ids filter.
+        Small doc_ids selections are scored exactly over just their rows;
+        larger ones become a mask for a single filtered search.
+        Returns one [(row_id, squared_l2_distance), ...] list per query.
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+
+        with self.lock:
+            if doc_ids is not None:
+                rows = self.select_rows(doc_ids)
+                if mask is not None:
+                    rows = rows[mask[rows]]
+                if self._use_subset(len(rows)):
+                    return self._subset_search(queries, k, rows)
+                mask = np.zeros(self._size, dtype=bool)
+                mask[rows] = True
+            return self._search_batch(queries, k, mask)
+
+    def _use_subset(self, num_rows: int) -> bool:
+        if num_rows <= self.EXACT_FILTER_ROWS:
+            return True
+        return self.active_index_type == "flat" and num_rows <= self._size * self.SUBSET_FRACTION
+
+    def _subset_search(self, queries: np.ndarray, k: int,
+                       rows: np.ndarray) -> List[List[Tuple[int, float]]]:
+        """Exact search over the given (live) rows only"""
+        k = min(k, len(rows))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        sq_norms = self._sq_norms[rows]
+        query_block = max(1, self.BLOCK_ELEMENTS // len(rows))
+        row_block = max(1, self.BLOCK_ELEMENTS // self.dim)
+
+        results = []
+        for start in range(0, len(queries), query_block):
+            block = queries[start:start + query_block]
+
+            # Gather the selected vectors in bounded pieces
+            inner = np.empty((len(block), len(rows)), dtype=np.float32)
+            for r in range(0, len(rows), row_block):
+                vectors = np.asarray(self._vectors[rows[r:r + row_block]], dtype=np.float32)
+                inner[:, r:r + len(vectors)] = block @ vectors.T
+
+            distances = self._l2_from_inner(inner, block, sq_norms)
+            for top, dists in zip(*self._top_k(distances, k)):
+                results.append([(int(rows[i]), float(d)) for i, d in zip(top, dists)])
+
+        return results
+
+    @staticmethod
+    def _l2_from_inner(inner: np.ndarray, queries: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        """||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2, computed in place"""
+        inner *= -2.0
+        inner += sq_norms
+        inner += np.einsum('ij,ij->i', queries, queries)[:, None]
+        np.maximum(inner, 0.0, out=inner)
+        return inner
+
+    @staticmethod
+    def _top_k(distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Column indices and values of the k smallest entries per row, sorted"""
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_distances, order, axis=1)
+
+    def _search_batch(self, queries: np.ndarray, k: int,
+                      mask: Optional[np.ndarray]) -> List[List[Tuple[int, float]]]:
+        # Tombstoned rows are never returned
+        if self._dead:
+            alive = self._alive[:self._size]
+            mask = alive if mask is None else (mask & alive)
+
+        candidates = int(np.count_nonzero(mask)) if mask is not None else self._size
+        k = min(k, candidates)
+        if self._size == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        index_type = self.active_index_type
+        if index_type != "flat" and not self._ann_pending(index_type):
+            return self._ann_search(index_type, queries, k, mask)
+
+        # Bound the (queries x rows) distance block to ~BLOCK_ELEMENTS floats
+        query_block = max(1, self.BLOCK_ELEMENTS // self._size)
+
+        results = []
+        for start in range(0, len(queries), query_block):
+            block = queries[start:start + query_block]
+
+            distances = self._l2_from_inner(self._inner_products(block), block,
+                                            self._sq_norms[:self._size])
+
+            if mask is not None:
+                distances[:, ~mask] = np.inf
+
+            for rows, dists in zip(*self._top_k(distances, k)):
+                results.append([(int(r), float(d)) for r, d in zip(rows, dists)])
+
+        return results
+
+    def lexical_search_batch(self, queries: List[str], k: int = 5, mask: np.ndarray = None,
+                             doc_ids: List[str] = None) -> List[List[Tuple[int, float]]]:
+        """
+        BM25 keyword search for each query, returns [(row_id, score), ...]
+        lists sorted by score (empty when lexical indexing is disabled).
+        """
+        with self.lock:
+            if self.bm25 is None:
+                return [[] for _ in queries]
+            if doc_ids is not None:
+                selected = self.doc_mask(doc_ids)
+                mask = selected if mask is None else (mask & selected)
+            if self._dead:
+                alive = self._alive[:self._size]
+                mask = alive if mask is None else (mask & alive)
+            return [self.bm25.search(q, k=k, mask=mask) for q in queries]
+
+    def distances(self, query_vector, rows) -> np.ndarray:
+        """Exact squared L2 distances from one query to the given rows"""
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        with self.lock:
+            rows = np.asarray(rows, dtype=np.int64)
+            vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+            distances = self._sq_norms[rows] - 2.0 * (vectors @ query) + query @ query
+            return np.maximum(distances, 0.0)
+
+    def _ann_search(self, index_type: str, queries: np.ndarray, k: int,
+                    mask: Optional[np.ndarray]) -> List[List[Tuple[int, float]]]:
+        """Search the FAISS backend, filtering rows with a bitmap selector"""
+        self._sync_ann(index_type)
+
+        selector = None
+        if mask is not None:
+            bitmap = np.packbits(mask, bitorder='little')
+            selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+
+        params = search_parameters(self._ann, nprobe=self.nprobe,
+                                   ef_search=self.ef_search, selector=selector)
+        quantized = index_type in QUANTIZED_TYPES and self.rescore_factor > 1
+        fetch = k * self.rescore_factor if quantized else k
+        distances, ids = self._ann.search(np.ascontiguousarray(queries), fetch, params=params)
+
+        if quantized:
+            return [self._rescore(query, row_ids[row_ids >= 0], k)
+                    for query, row_ids in zip(queries, ids)]
+
+        # FAISS pads with -1 when fewer than k rows pass the filter
+        return [
+            [(int(r), float(d)) for r, d in zip(row_ids, row_distances) if r >= 0]
+            for row_ids, row_distances in zip(ids, distances)
+        ]
+
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Exact distances for candidate rows from a quantized backend, top k"""
+        distances = self.distances(query, rows)
+        order = np.argsort(distances, kind='stable')[:k]
+        return [(int(rows[i]), float(distances[i])) for i in order]
+
+    def _ann_pending(self, index_type: str) -> bool:
+        """Whether the background thread is still building the index_type FAISS index"""
+        if self._background is None or not self._background.is_alive():
+            return False
+        return self._ann_path is None and (self._ann is None or index_type_of(self._ann) != index_type)
+
+    def _ann_ready(self, index_type: str) -> bool:
+        """Whether the FAISS index (loading a saved one) is of index_type and matches the rows"""
+        if self._ann is None and self._ann_path is not None:
+            if os.path.exists(self._ann_path):
+                self._ann = faiss.read_index(self._ann_path)
+                self._ann_rows = self._ann.ntotal
+            self._ann_path = None
+        return self._ann is not None and index_type_of(self._ann) == index_type and self._ann_rows <= self._size
+
+    def build_ann(self) -> bool:
+        """
+        Build the FAISS index of the active backend, if it has none yet.
+        The build runs outside the lock, so searches (exact meanwhile) and
+        appends are not held up; it is thrown away if a compaction
+        renumbered the rows in the meantime.
+        """
+        with self.lock:
+            index_type = self.active_index_type
+            if index_type == "flat" or self._ann_ready(index_type):
+                return False
+            layout, size, vectors = self._layout, self._size, self._vectors
+
+        # Appends only write past `size`, so reading the first `size` rows here is safe
+        ann = build_faiss_index(np.ascontiguousarray(vectors[:size], dtype=np.float32), index_type,
+                                nprobe=self.nprobe, ef_search=self.ef_search)
+
+        with self.lock:
+            if self._layout != layout:
+                return False
+            self._ann, self._ann_rows, self._ann_path = ann, size, None
+        print(f" Built {index_type} index over {size} chunks")
+        return True
+
+    def _sync_ann(self, index_type: str):
+        """Build the FAISS index if needed and add rows appended since"""
+        if not self._ann_ready(index_type):
+            print(f" Building {index_type} index over {self._size} chunks")
+            self._ann = build_faiss_index(self._float32_rows(0, self._size), index_type,
+                                          nprobe=self.nprobe, ef_search=self.ef_search)
+            self._ann_rows = self._size
+        elif self._ann_rows < self._size:
+            self._ann.add(self._float32_rows(self._ann_rows, self._size))
+            self._ann_rows = self._size
+
+    def _float32_rows(self, start: int, end: int) -> np.ndarray:
+        return np.ascontiguousarray(self._vectors[start:end], dtype=np.float32)
+
+    def _inner_products(self, queries: np.ndarray) -> np.ndarray:
+        """Dot products of every query with every stored vector, shape (queries, rows)"""
+        vectors = self.vectors
+        if vectors.dtype == np.float32:
+            return queries @ vectors.T
+
+        # Upcast block by block instead of copying the whole matrix
+        out = np.empty((len(queries), self._size), dtype=np.float32)
+        for start in range(0, self._size, self.BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + self.BLOCK_ROWS], dtype=np.float32)
+            out[:, start:start + len(block)] = queries @ block.T
+        return out
+
+    def save(self, path: str, dtype: str = "float32") -> int:
+        """
+        Write the index to a directory (vectors as float32 or float16).
+        Returns the version written, for release_files().
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+        os.makedirs(path, exist_ok=True)
+
+        # Compact and build the ANN index before taking the lock, so searches
+        # keep running; the locked pass only catches up with later changes
+        self.wait_for_background()
+        self.compact()
+        self.build_ann()
+
+        with self.lock:
+            # Stores never contain tombstones
+            self.compact()
+            self._save(path, dtype)
+            return self._version
+
+    def release_files(self, version: int) -> bool:
+        """
+        Let go of the memory-mapped files of a loaded store, so its
+        directory can be renamed or deleted (Windows refuses to while they
+        are mapped, POSIX keeps the unlinked files on disk). Only done when
+        the index is still at `version`, as returned by save(), and no
+        background work holds the arrays; the caller must hold `lock` and
+        call reopen() on the saved copy before releasing it.
+        Returns whether the files were released.
+        """
+        if self._version != version:
+            return False
+        if self._background is not None and self._background.is_alive():
+            return False
+
+        self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self.texts = []
+        self.metadatas = []
+        if self.bm25 is not None:
+            self.bm25 = BM25Index()
+        return True
+
+    def reopen(self, path: str):
+        """Map the arrays of the store at path, which must hold this index's rows (see release_files)"""
+        with self.lock:
+            saved = type(self).load(path, index_type=self.index_type, ann_threshold=self.ann_threshold,
+                                    nprobe=self.nprobe, ef_search=self.ef_search,
+                                    lexical=self.bm25 is not None, rescore_factor=self.rescore_factor)
+            self._vectors, self._sq_norms = saved._vectors, saved._sq_norms
+            self.texts, self.metadatas = saved.texts, saved.metadatas
+            self.bm25 = saved.bm25
+            self._version += 1
+
+    def _save(self, path: str, dtype: str):
+        doc_ids = list(self.doc_rows)
+        row_doc = np.full(self._size, -1, dtype=np.int32)
+        for ordinal, doc_id in enumerate(doc_ids):
+            row_doc[self.doc_rows[doc_id]] = ordinal
+
+        np.save(os.path.join(path, "vectors.npy"), self.vectors.astype(dtype, copy=False))
+        np.save(os.path.join(path, "sq_norms.npy"), self._sq_norms[:self._size])
+        np.save(os.path.join(path, "row_doc.npy"), row_doc)
+        _write_blob(self.texts,
+                    os.path.join(path, "texts.bin"),
+                    os.path.join(path, "texts.idx.npy"))
+        _write_blob(self.metadatas,
+                    os.path.join(path, "metadatas.bin"),
+                    os.path.join(path, "metadatas.idx.npy"),
+                    encode=json.dumps)
+
+        if self.bm25 is not None:
+            self.bm25.save(path)
+
+        # Persist the ANN index of the active backend so a warm restart doesn't have to rebuild it
+        ann_type = self.active_index_type
+        if ann_type != "flat":
+            self._sync_ann(ann_type)
+            faiss.write_index(self._ann, os.path.join(path, "ann.faiss"))
+        else:
+            ann_type = None
+
+        with open(os.path.join(path, "index.json"), 'w', encoding='utf-8') as f:
+            json.dump({
+                'format_version': INDEX_FORMAT_VERSION,
+                'dim': self.dim,
+                'size': self._size,
+                'dtype': dtype,
+                'doc_ids': doc_ids,
+                'ann_index_type': ann_type,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, **config) -> "VectorIndex":
+        """
+        Open an index written by save(); vectors stay memory-mapped.
+        config is passed to the constructor (index_type, nprobe, ...).
+        """
+        with open(os.path.join(path, "index.json"), encoding='utf-8') as f:
+            info = json.load(f)
+
+        if info.get('format_version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format: {info.get('format_version')}")
+
+        index = cls(dim=info['dim'], **config)
+        index._size = info['size']
+        index._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode='r')
+        index._sq_norms = np.load(os.path.join(path, "sq_norms.npy"), mmap_mode='r')
+        index._alive = np.ones(index._size, dtype=bool)
+        if info.get('ann_index_type'):
+            # Read lazily on the first ANN search
+            index._ann_path = os.path.join(path, "ann.faiss")
+        index.texts = MappedList(os.path.join(path, "texts.bin"),
+                                 os.path.join(path, "texts.idx.npy"))
+        index.metadatas = MappedList(os.path.join(path, "metadatas.bin"),
+                                     os.path.join(path, "metadatas.idx.npy"),
+                                     decode=json.loads)
+
+        if index._size and index._vectors.shape != (index._size, index.dim):
+            raise ValueError(f"Vector file shape {index._vectors.shape} does not match index.json")
+
+        if index.bm25 is not None:
+            if BM25Index.exists(path):
+                index.bm25 = BM25Index.load(path)
+            else:
+                # Store written before lexical indexing existed
+                index.bm25.add(0, list(index.texts))
+
+        # Group rows by document without touching the vectors
+        row_doc = np.load(os.path.join(path, "row_doc.npy"))
+        order = np.argsort(row_doc, kind='stable')
+        bounds = np.searchsorted(row_doc[order], np.arange(len(info['doc_ids']) + 1))
+        index.doc_rows = {
+            doc_id: order[bounds[i]:bounds[i + 1]].astype(np.int64)
+            for i, doc_id in enumerate(info['doc_ids'])
+        }
+
+        return index